@@ -66,6 +66,22 @@ DATABASES = {
 db_from_env = dj_database_url.config(conn_max_age=500)
 DATABASES['default'].update(db_from_env)
 
+# Общий кэш нужен, чтобы prewarm_exams прогревал экзамены для всех воркеров
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -76,6 +92,12 @@ TIME_ZONE = 'Asia/Tashkent'
 USE_I18N = True
 USE_TZ = True
 
+# Куда archive_old_attempts складывает сжатые партиции старых попыток
+ARCHIVE_ROOT = Path(os.getenv('ARCHIVE_ROOT', BASE_DIR / 'archive'))
+
+# Куда generate_cohort_reports складывает zip с отчетами
+REPORTS_ROOT = Path(os.getenv('REPORTS_ROOT', BASE_DIR / 'reports'))
+
 STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
@@ -95,6 +117,8 @@ JAZZMIN_SETTINGS = {
     "search_model": "auth.User",
     "topmenu_links": [
         {"name": "Dashboard", "url": "home", "permissions": ["auth.view_user"]},
+        {"name": "Активность", "url": "activity_dashboard", "permissions": ["core.view_studentresult"]},
+        {"name": "Журнал", "url": "gradebook", "permissions": ["core.view_studentresult"]},
     ],
     "show_sidebar": True,
     "navigation_expanded": True,
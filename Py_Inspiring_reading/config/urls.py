@@ -4,6 +4,9 @@ from django.contrib.auth import views as auth_views
 from core import views
 
 urlpatterns = [
+    path('admin/activity/', views.activity_dashboard, name='activity_dashboard'),
+    path('admin/gradebook/', views.gradebook, name='gradebook'),
+    path('admin/reports/<int:job_id>/download/', views.download_report, name='download_report'),
     path('admin/', admin.site.urls),
 
     # Авторизация
@@ -14,5 +17,7 @@ urlpatterns = [
     # Основное приложение
     path('', views.dashboard, name='dashboard'),
     path('exam/<int:exam_id>/', views.take_exam, name='take_exam'),
+    path('exam/<int:exam_id>/section/<int:order>/', views.exam_section, name='exam_section'),
     path('exam/<int:exam_id>/submit/', views.submit_exam, name='submit_exam'),
+    path('exam/<int:exam_id>/events/', views.record_proctoring_events, name='proctoring_events'),
 ]
\ No newline at end of file
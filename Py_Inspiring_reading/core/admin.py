@@ -1,6 +1,11 @@
 from django.contrib import admin
 from django import forms
-from .models import ReadingExam, Question, Choice, StudentResult, ExamSession
+from django.utils.html import format_html
+from .models import ReadingExam, ExamSection, Question, Choice, StudentResult, ExamSession, ProctoringSummary, ArchivedResult, ReportJob
+from .archive import load_archived_detail
+from .reports import start_report_job
+from django.urls import reverse
+import json
 
 
 class ChoiceInlineForQuestion(admin.TabularInline):
@@ -27,6 +32,11 @@ class QuestionAdminForm(forms.ModelForm):
             '🔗 Только для Matching. Формат JSON: '
             '[{"left": "Вопрос 1", "right": "Ответ A"}, {"left": "Вопрос 2", "right": "Ответ B"}]'
         )
+        # Секции только своего экзамена; для нового вопроса — все, проверит Question.clean()
+        sections = ExamSection.objects.select_related('exam')
+        if self.instance.exam_id:
+            sections = sections.filter(exam_id=self.instance.exam_id)
+        self.fields['section'].queryset = sections
 
 
 @admin.register(Question)
@@ -39,7 +49,7 @@ class QuestionAdmin(admin.ModelAdmin):
 
     fieldsets = (
         ('Основная информация', {
-            'fields': ('exam', 'question_type', 'text', 'order')
+            'fields': ('exam', 'section', 'question_type', 'text', 'order')
         }),
         ('Настройки для Multiple Choice', {
             'fields': (),
@@ -79,7 +89,7 @@ class QuestionAdmin(admin.ModelAdmin):
 
 class QuestionInlineForExam(admin.TabularInline):
     model = Question
-    fields = ['order', 'question_type', 'text', 'edit_link']
+    fields = ['order', 'section', 'question_type', 'text', 'edit_link']
     readonly_fields = ['edit_link']
     extra = 1
     show_change_link = True
@@ -92,12 +102,41 @@ class QuestionInlineForExam(admin.TabularInline):
     edit_link.short_description = 'Действия'
     edit_link.allow_tags = True
 
+    def get_formset(self, request, obj=None, **kwargs):
+        # Инлайны создаются заново на каждый запрос, поэтому экзамен можно держать на экземпляре
+        self.exam = obj
+        return super().get_formset(request, obj, **kwargs)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name != 'section':
+            return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+        exam = getattr(self, 'exam', None)
+        kwargs['queryset'] = ExamSection.objects.filter(exam=exam).select_related('exam') if exam else ExamSection.objects.none()
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        # Варианты вычисляются один раз на весь формсет, а не запросом в каждой строке
+        field.choices = list(field.choices)
+        return field
+
+
+class ExamSectionInline(admin.StackedInline):
+    model = ExamSection
+    fields = ['order', 'title', 'passage_text']
+    extra = 0
+
 
 @admin.register(ReadingExam)
 class ReadingExamAdmin(admin.ModelAdmin):
-    list_display = ['title', 'time_limit_minutes', 'question_count', 'types_summary', 'created_at']
-    inlines = [QuestionInlineForExam]
+    list_display = ['title', 'time_limit_minutes', 'opens_at', 'closes_at', 'question_count', 'types_summary', 'created_at']
+    inlines = [ExamSectionInline, QuestionInlineForExam]
     search_fields = ['title', 'description']
+    actions = ['generate_reports']
+
+    @admin.action(description='📄 Сгенерировать отчеты по студентам')
+    def generate_reports(self, request, queryset):
+        for exam in queryset:
+            start_report_job(exam, request.user)
+        self.message_user(request, f"Запущено задач: {queryset.count()}. Прогресс — в разделе «Генерация отчетов».")
 
     def question_count(self, obj):
         count = obj.questions.count()
@@ -153,16 +192,92 @@ class StudentResultAdmin(admin.ModelAdmin):
     percentage_display.allow_tags = True
 
 
+class ProctoringSummaryInline(admin.StackedInline):
+    model = ProctoringSummary
+    can_delete = False
+    readonly_fields = ['tab_switches', 'focus_losses', 'pastes', 'dwell_ms', 'last_event_ms']
+
+
 @admin.register(ExamSession)
 class ExamSessionAdmin(admin.ModelAdmin):
-    list_display = ['student', 'exam', 'started_at', 'is_active', 'is_expired']
+    list_display = ['student', 'exam', 'started_at', 'is_active', 'is_expired', 'focus_losses']
     list_filter = ['is_active', 'started_at']
+    list_select_related = ['student', 'exam', 'proctoring_summary']
     search_fields = ['student__username', 'exam__title']
     readonly_fields = ['started_at']
+    inlines = [ProctoringSummaryInline]
+
+    def focus_losses(self, obj):
+        summary = getattr(obj, 'proctoring_summary', None)
+        if summary is None:
+            return '-'
+        return f"👁 {summary.focus_losses} | ⇄ {summary.tab_switches} | 📋 {summary.pastes}"
+
+    focus_losses.short_description = 'Прокторинг'
 
     def is_expired(self, obj):
         if obj.is_expired():
             return '⏰ Истекло'
         return '✅ Активно'
 
-    is_expired.short_description = 'Статус'
\ No newline at end of file
+    is_expired.short_description = 'Статус'
+
+
+@admin.register(ProctoringSummary)
+class ProctoringSummaryAdmin(admin.ModelAdmin):
+    list_display = ['session', 'focus_losses', 'tab_switches', 'pastes']
+    list_select_related = ['session__student', 'session__exam']
+    list_filter = ['session__exam']
+    search_fields = ['session__student__username', 'session__exam__title']
+    readonly_fields = ['session', 'tab_switches', 'focus_losses', 'pastes', 'dwell_ms', 'last_event_ms']
+    ordering = ['-focus_losses']
+
+
+@admin.register(ArchivedResult)
+class ArchivedResultAdmin(admin.ModelAdmin):
+    list_display = ['student', 'exam', 'score', 'total_questions', 'percentage', 'completed_at']
+    list_filter = ['exam']
+    list_select_related = ['student', 'exam']
+    search_fields = ['student__username', 'exam__title']
+    readonly_fields = ['student', 'exam', 'score', 'total_questions', 'percentage', 'completed_at',
+                       'archive_path', 'archived_answers']
+    exclude = ['result_id']
+
+    def archived_answers(self, obj):
+        record = load_archived_detail(obj)
+        if record is None:
+            return '⚠️ Запись не найдена в файле архива'
+        return format_html('<pre>{}</pre>', json.dumps(record['answers_detail'], ensure_ascii=False, indent=2))
+
+    archived_answers.short_description = 'Детали ответов'
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ['exam', 'status', 'progress_display', 'created_by', 'created_at', 'finished_at', 'download_link']
+    list_filter = ['status', 'exam']
+    list_select_related = ['exam', 'created_by']
+    readonly_fields = ['exam', 'created_by', 'status', 'total', 'processed', 'archive_path', 'error',
+                       'pid', 'heartbeat_at', 'created_at', 'finished_at']
+
+    def changelist_view(self, request, extra_context=None):
+        ReportJob.mark_stale()
+        return super().changelist_view(request, extra_context)
+
+    def progress_display(self, obj):
+        return f"{obj.processed}/{obj.total} ({obj.progress()}%)"
+
+    progress_display.short_description = 'Прогресс'
+
+    def download_link(self, obj):
+        if obj.status != 'done':
+            return '-'
+        return format_html('<a href="{}">⬇️ zip</a>', reverse('download_report', args=[obj.pk]))
+
+    download_link.short_description = 'Файл'
+
+    def has_add_permission(self, request):
+        return False
\ No newline at end of file
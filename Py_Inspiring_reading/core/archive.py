@@ -0,0 +1,149 @@
+import gzip
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedResult, ExamSession, StudentResult
+
+
+def partition_path(kind, exam_id, moment):
+    """<kind>/exam_<id>/<YYYY-MM>.jsonl.gz — один файл на экзамен и месяц"""
+    return Path(kind) / f"exam_{exam_id}" / f"{timezone.localtime(moment):%Y-%m}.jsonl.gz"
+
+
+def already_taken(student, exam):
+    """unique_together для StudentResult с учетом перенесенных в архив результатов"""
+    return (
+        StudentResult.objects.filter(student=student, exam=exam).exists()
+        or ArchivedResult.objects.filter(student=student, exam=exam).exists()
+    )
+
+
+def write_partitions(root, records):
+    """Дописывает записи в gzip-файлы партиций. Каждая пачка — отдельный gzip member,
+    файл закрывается сразу, поэтому сбой не оставляет недописанных архивов"""
+    by_path = {}
+    for path, record in records:
+        by_path.setdefault(path, []).append(record)
+
+    for path, rows in by_path.items():
+        full_path = Path(root) / path
+        full_path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(full_path, 'at', encoding='utf-8') as handle:
+            for record in rows:
+                handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def archive_results(queryset, root, batch_size):
+    """Переносит результаты в архив пачками. Возвращает количество перенесенных"""
+    archived = 0
+    while True:
+        batch = list(queryset.order_by('pk')[:batch_size])
+        if not batch:
+            return archived
+
+        # Начало сессии сохраняем в индексе: по нему backfill_rollups восстановит sessions_started
+        started = dict(
+            ((student_id, exam_id), started_at)
+            for student_id, exam_id, started_at in ExamSession.objects.filter(
+                student_id__in={r.student_id for r in batch}, exam_id__in={r.exam_id for r in batch}
+            ).values_list('student_id', 'exam_id', 'started_at')
+        )
+
+        records, index = [], []
+        for result in batch:
+            path = partition_path('results', result.exam_id, result.completed_at)
+            records.append((path, {
+                'id': result.pk,
+                'student_id': result.student_id,
+                'exam_id': result.exam_id,
+                'score': result.score,
+                'total_questions': result.total_questions,
+                'percentage': result.percentage,
+                'completed_at': result.completed_at.isoformat(),
+                'answers_detail': result.answers_detail,
+            }))
+            index.append(ArchivedResult(
+                result_id=result.pk,
+                student_id=result.student_id,
+                exam_id=result.exam_id,
+                score=result.score,
+                total_questions=result.total_questions,
+                percentage=result.percentage,
+                completed_at=result.completed_at,
+                session_started_at=started.get((result.student_id, result.exam_id)),
+                archive_path=str(path),
+            ))
+        # Сначала данные на диск, потом удаление — при сбое пачка просто запишется повторно
+        write_partitions(root, records)
+
+        with transaction.atomic():
+            ArchivedResult.objects.bulk_create(index, ignore_conflicts=True)
+            StudentResult.objects.filter(pk__in=[r.pk for r in batch]).delete()
+        archived += len(batch)
+
+
+def archive_sessions(queryset, root, batch_size):
+    """Переносит завершенные сессии в архив вместе со сводкой прокторинга"""
+    archived = 0
+    while True:
+        batch = list(queryset.select_related('proctoring_summary').order_by('pk')[:batch_size])
+        if not batch:
+            return archived
+
+        records = []
+        for session in batch:
+            summary = getattr(session, 'proctoring_summary', None)
+            records.append((partition_path('sessions', session.exam_id, session.started_at), {
+                'id': session.pk,
+                'student_id': session.student_id,
+                'exam_id': session.exam_id,
+                'started_at': session.started_at.isoformat(),
+                'proctoring': {
+                    'tab_switches': summary.tab_switches,
+                    'focus_losses': summary.focus_losses,
+                    'pastes': summary.pastes,
+                    'dwell_ms': summary.dwell_ms,
+                } if summary else None,
+            }))
+        write_partitions(root, records)
+
+        with transaction.atomic():
+            ExamSession.objects.filter(pk__in=[s.pk for s in batch]).delete()
+        archived += len(batch)
+
+
+def load_archived_details(archived_results):
+    """Полные записи для многих архивных результатов: каждый файл партиции читается один раз.
+    Возвращает {result_id: запись}"""
+    wanted = {}
+    for archived in archived_results:
+        wanted.setdefault(archived.archive_path, set()).add(archived.result_id)
+
+    records = {}
+    for archive_path, result_ids in wanted.items():
+        path = Path(settings.ARCHIVE_ROOT) / archive_path
+        if not path.exists():
+            continue
+        with gzip.open(path, 'rt', encoding='utf-8') as handle:
+            for line in handle:
+                record = json.loads(line)
+                if record['id'] in result_ids:
+                    records[record['id']] = record
+    return records
+
+
+def load_archived_detail(archived_result):
+    """Читает полную запись результата из файла партиции"""
+    path = Path(settings.ARCHIVE_ROOT) / archived_result.archive_path
+    if not path.exists():
+        return None
+    with gzip.open(path, 'rt', encoding='utf-8') as handle:
+        for line in handle:
+            record = json.loads(line)
+            if record['id'] == archived_result.result_id:
+                return record
+    return None
@@ -0,0 +1,113 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+from django.template.defaultfilters import linebreaks_filter
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import ReadingExam
+
+# Контент экзамена меняется только через админку, поэтому держим его долго.
+# Ключи содержат content_version, так что после правок старые записи просто истекают
+EXAM_CONTENT_TIMEOUT = 60 * 60 * 12
+
+# Эти бэкенды живут внутри одного процесса: прогрев из отдельной команды до воркеров не доходит
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def exam_content_key(exam):
+    return f'exam_content:{exam.id}:{exam.content_version}'
+
+
+def exam_section_key(exam, order):
+    return f'exam_section:{exam.id}:{exam.content_version}:{order}'
+
+
+def build_exam_content(exam):
+    """Секции с текстом, вопросами и вариантами ответов для Take_Exam и проверки в submit_exam.
+
+    Экзамен без секций — одна неявная секция из exam.passage_text.
+    Вопросы без секции попадают в первую.
+    """
+    sections = [
+        {'order': s.order, 'title': s.title, 'passage_html': linebreaks_filter(s.passage_text), 'id': s.id}
+        for s in exam.sections.all()
+    ] or [{'order': 1, 'title': '', 'passage_html': linebreaks_filter(exam.passage_text), 'id': None}]
+
+    by_id = {section['id']: section for section in sections}
+    for section in sections:
+        section['questions'] = []
+    for question in exam.questions.prefetch_related('choices'):
+        by_id.get(question.section_id, sections[0])['questions'].append(question)
+
+    # Сквозная нумерация вопросов через все секции
+    number = 1
+    for section in sections:
+        section['first_number'] = number
+        number += len(section['questions'])
+        section['last_number'] = number - 1
+
+    return {
+        'sections': sections,
+        'question_count': number - 1,
+        'question_ids': {q.id for section in sections for q in section['questions']},
+    }
+
+
+def get_exam_content(exam):
+    content = cache.get(exam_content_key(exam))
+    if content is None:
+        content = warm_exam_content(exam)
+    return content
+
+
+def get_section_html(exam, order):
+    """Готовый HTML секции (текст + вопросы) для ленивой подгрузки. None — нет такой секции"""
+    key = exam_section_key(exam, order)
+    html = cache.get(key)
+    if html is None:
+        section = next((s for s in get_exam_content(exam)['sections'] if s['order'] == order), None)
+        if section is None:
+            return None
+        html = render_to_string('Exam_Section.html', {'section': section})
+        cache.set(key, html, EXAM_CONTENT_TIMEOUT)
+    return html
+
+
+def warm_exam_content(exam):
+    content = build_exam_content(exam)
+    cache.set(exam_content_key(exam), content, EXAM_CONTENT_TIMEOUT)
+    return content
+
+
+def warm_exam(exam, rebuild=True):
+    """Прогрев всего экзамена: контент и HTML всех секций.
+    rebuild=False оставляет уже закэшированную текущую версию как есть"""
+    content = warm_exam_content(exam) if rebuild else get_exam_content(exam)
+    for section in content['sections']:
+        get_section_html(exam, section['order'])
+    return content
+
+
+def cache_is_process_local():
+    return settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES
+
+
+def invalidate_exam_content(exam_id):
+    # update() не вызывает post_save, поэтому сигналы не зациклятся
+    ReadingExam.objects.filter(id=exam_id).update(content_version=F('content_version') + 1)
+
+
+def exams_to_prewarm(minutes, now=None):
+    """Экзамены с окном, которое откроется в ближайшие `minutes` минут или уже открыто"""
+    now = now or timezone.now()
+    return ReadingExam.objects.filter(
+        Q(closes_at__isnull=True) | Q(closes_at__gt=now),
+        opens_at__isnull=False,
+        opens_at__lte=now + timedelta(minutes=minutes),
+    )
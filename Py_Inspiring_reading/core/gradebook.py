@@ -0,0 +1,82 @@
+import math
+from array import array
+
+from django.utils.html import escape
+
+from .models import ArchivedResult, ReadingExam, StudentResult
+
+MISSING = math.nan
+
+
+def build_gradebook(exam_ids=None, search=''):
+    """Матрица студент × экзамен одним запросом, без создания объектов моделей.
+
+    Возвращает (exams, rows), где rows — список (username, array('f') процентов, средний процент).
+    """
+    exams = ReadingExam.objects.order_by('created_at')
+    if exam_ids:
+        exams = exams.filter(id__in=exam_ids)
+    exams = list(exams.values_list('id', 'title'))
+    column = {exam_id: idx for idx, (exam_id, _) in enumerate(exams)}
+
+    fields = ('student_id', 'student__username', 'exam_id', 'percentage')
+    hot = StudentResult.objects.filter(exam_id__in=column).values_list(*fields).order_by()
+    archived = ArchivedResult.objects.filter(exam_id__in=column).values_list(*fields).order_by()
+    if search:
+        hot = hot.filter(student__username__icontains=search)
+        archived = archived.filter(student__username__icontains=search)
+
+    students = {}
+    empty_row = array('f', [MISSING]) * len(exams)
+    for student_id, username, exam_id, percentage in hot.union(archived, all=True):
+        entry = students.get(student_id)
+        if entry is None:
+            entry = students[student_id] = (username, array('f', empty_row))
+        entry[1][column[exam_id]] = percentage
+
+    rows = []
+    for username, values in students.values():
+        taken = [v for v in values if not math.isnan(v)]
+        rows.append((username, values, sum(taken) / len(taken)))
+    return exams, rows
+
+
+def sort_gradebook(rows, exams, sort, descending):
+    """sort: 'name', 'avg' или id экзамена. Пустые ячейки всегда внизу"""
+    if sort == 'name':
+        rows.sort(key=lambda row: row[0].lower(), reverse=descending)
+        return
+
+    if sort == 'avg':
+        rows.sort(key=lambda row: row[2], reverse=descending)
+        return
+
+    idx = next((i for i, (exam_id, _) in enumerate(exams) if str(exam_id) == sort), None)
+    if idx is None:
+        rows.sort(key=lambda row: row[0].lower())
+        return
+    rows.sort(key=lambda row: (math.isnan(row[1][idx]), -row[1][idx] if descending else row[1][idx]))
+
+
+def _cell(value):
+    if math.isnan(value):
+        return '<td class="text-muted">—</td>'
+    if value >= 80:
+        css = 'text-success'
+    elif value >= 50:
+        css = 'text-warning'
+    else:
+        css = 'text-danger'
+    return f'<td class="{css}">{value:.0f}</td>'
+
+
+def render_rows(rows, chunk_size=500):
+    """HTML строк таблицы кусками — для StreamingHttpResponse"""
+    chunk = []
+    for username, values, avg in rows:
+        chunk.append(f'<tr><th>{escape(username)}</th>{"".join(_cell(v) for v in values)}<td><b>{avg:.1f}</b></td></tr>')
+        if len(chunk) >= chunk_size:
+            yield "\n".join(chunk)
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk)
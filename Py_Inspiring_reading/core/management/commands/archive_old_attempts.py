@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from core.archive import archive_results, archive_sessions
+from core.models import ArchivedResult, ExamSession, StudentResult
+
+
+class Command(BaseCommand):
+    help = "Переносит старые результаты и сессии в сжатые JSONL-архивы и удаляет их из рабочих таблиц"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Архивировать попытки старше N дней")
+        parser.add_argument('--before', help="Архивировать попытки до даты (YYYY-MM-DD)")
+        parser.add_argument(
+            '--closed-exams',
+            action='store_true',
+            help="Архивировать все попытки экзаменов, окно которых уже закрыто"
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        cutoff = None
+        if options['days']:
+            cutoff = timezone.now() - timedelta(days=options['days'])
+        elif options['before']:
+            try:
+                cutoff = timezone.make_aware(datetime.strptime(options['before'], '%Y-%m-%d'))
+            except ValueError:
+                raise CommandError("--before должен быть в формате YYYY-MM-DD")
+        if cutoff is None and not options['closed_exams']:
+            raise CommandError("Укажите --days, --before или --closed-exams")
+
+        now = timezone.now()
+        results_filter = Q(pk__in=[])
+        sessions_filter = Q(pk__in=[])
+        if cutoff:
+            results_filter |= Q(completed_at__lt=cutoff)
+            sessions_filter |= Q(started_at__lt=cutoff)
+        if options['closed_exams']:
+            results_filter |= Q(exam__closes_at__lt=now)
+            sessions_filter |= Q(exam__closes_at__lt=now)
+
+        root = settings.ARCHIVE_ROOT
+        results = archive_results(StudentResult.objects.filter(results_filter), root, options['batch_size'])
+        self.stdout.write(f"📦 Результатов перенесено: {results}")
+
+        # Сессии без результата остаются: по ним take_exam понимает, что время уже вышло
+        has_archived_result = ArchivedResult.objects.filter(student=OuterRef('student'), exam=OuterRef('exam'))
+        sessions = archive_sessions(
+            ExamSession.objects.filter(sessions_filter, Exists(has_archived_result), is_active=False),
+            root,
+            options['batch_size']
+        )
+        self.stdout.write(f"📦 Сессий перенесено: {sessions}")
+
+        self.stdout.write(self.style.SUCCESS(f"Архив: {root}"))
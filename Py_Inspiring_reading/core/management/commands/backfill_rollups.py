@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.rollups import backfill_rollups
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает почасовые и дневные сводки активности из StudentResult, ExamSession и архива попыток"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help="Пересчитать только последние N дней (по умолчанию — всю историю)"
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days']:
+            since = timezone.now() - timedelta(days=options['days'])
+
+        hourly, daily = backfill_rollups(since=since, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Сводки пересчитаны: {hourly} час(ов), {daily} дн."))
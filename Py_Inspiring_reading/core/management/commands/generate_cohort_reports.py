@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import ReadingExam, ReportJob
+from core.reports import run_report_job
+
+
+class Command(BaseCommand):
+    help = "Генерирует HTML-отчеты по всем студентам экзамена в пуле процессов и упаковывает их в zip"
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_id', nargs='?', type=int, help="ID экзамена (создаст новую задачу)")
+        parser.add_argument('--job', type=int, help="ID уже созданной задачи (запуск из админки)")
+        parser.add_argument('--workers', type=int, help="Число процессов (по умолчанию — по числу CPU)")
+
+    def handle(self, *args, **options):
+        if options['job']:
+            job = ReportJob.objects.select_related('exam').filter(pk=options['job']).first()
+            if job is None:
+                raise CommandError(f"Задача {options['job']} не найдена")
+        elif options['exam_id']:
+            exam = ReadingExam.objects.filter(pk=options['exam_id']).first()
+            if exam is None:
+                raise CommandError(f"Экзамен {options['exam_id']} не найден")
+            job = ReportJob.objects.create(exam=exam)
+        else:
+            raise CommandError("Укажите exam_id или --job")
+
+        run_report_job(job, workers=options['workers'])
+        job.refresh_from_db()
+        self.stdout.write(self.style.SUCCESS(f"Готово: {job.processed} отчет(ов) → {job.archive_path}"))
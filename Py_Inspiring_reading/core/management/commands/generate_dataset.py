@@ -0,0 +1,266 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import ReadingExam, Question, Choice, StudentResult, ExamSession
+
+WORDS = (
+    "the of and to in is that for it as was with be by on not he this are or his from at which but have an "
+    "they you were their one all we can her has there been if more when will would who so no climate ocean "
+    "research scientists evidence species population century industry history economic researchers water "
+    "language children students memory brain studies theory system energy development experiment results "
+    "environment ancient cities culture technology information social global changes early modern natural "
+    "growth survey however although therefore similarly increase decrease significant traditional method"
+).split()
+
+# Примерное распределение типов вопросов в IELTS Reading
+QUESTION_TYPE_WEIGHTS = [
+    ('true_false_ng', 30),
+    ('single_choice', 25),
+    ('fill_blank', 15),
+    ('sentence_completion', 10),
+    ('matching', 10),
+    ('multiple_choice', 10),
+]
+
+PASSAGE_WORDS = (700, 1000)
+TFNG_CHOICES = ['True', 'False', 'Not Given']
+
+
+@contextmanager
+def manual_started_at():
+    """ExamSession.started_at — auto_now_add, а нам нужны даты в прошлом"""
+    field = ExamSession._meta.get_field('started_at')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = "Генерирует реалистичный набор данных (экзамены, студенты, сессии, результаты) для замеров производительности"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--exams', type=int, default=60, help="Количество экзаменов")
+        parser.add_argument('--users', type=int, default=20000, help="Количество студентов")
+        parser.add_argument('--results', type=int, default=1000000, help="Количество результатов (не больше users × exams)")
+        parser.add_argument('--questions', type=int, nargs=2, default=[13, 40], metavar=('MIN', 'MAX'),
+                            help="Диапазон числа вопросов в экзамене")
+        parser.add_argument('--days', type=int, default=365, help="За сколько последних дней распределить результаты")
+        parser.add_argument('--active-sessions', type=int, default=300, help="Сколько незавершенных сессий создать")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='gen', help="Префикс имен пользователей и названий экзаменов")
+
+    def handle(self, *args, **options):
+        if options['results'] > options['users'] * options['exams']:
+            raise CommandError("results не может быть больше users × exams (unique_together student/exam)")
+        if User.objects.filter(username__startswith=f"{options['prefix']}_").exists():
+            raise CommandError(f"Пользователи с префиксом '{options['prefix']}_' уже есть, укажите другой --prefix")
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        started = time.monotonic()
+
+        exam_ids, exam_questions = self.create_exams(options['exams'], *options['questions'])
+        self.log(f"Экзамены: {len(exam_ids)}", started)
+
+        user_ids = self.create_users(options['users'])
+        self.log(f"Студенты: {len(user_ids)}", started)
+
+        with manual_started_at():
+            created = self.create_results(user_ids, exam_ids, exam_questions, options['results'], options['days'], started)
+            self.log(f"Результаты: {created}", started)
+            active = self.create_active_sessions(user_ids, exam_ids, options['active_sessions'])
+            self.log(f"Активные сессии: {active}", started)
+
+        self.stdout.write(self.style.SUCCESS(f"Готово за {time.monotonic() - started:.0f} с"))
+
+    def log(self, message, started):
+        self.stdout.write(f"[{time.monotonic() - started:6.1f} с] {message}")
+
+    def words(self, count):
+        return " ".join(self.rng.choice(WORDS) for _ in range(count))
+
+    def sentence(self, low, high):
+        return self.words(self.rng.randint(low, high)).capitalize() + "."
+
+    def passage(self):
+        target = self.rng.randint(*PASSAGE_WORDS)
+        paragraphs, total = [], 0
+        while total < target:
+            sentences = [self.sentence(8, 22) for _ in range(self.rng.randint(4, 8))]
+            paragraphs.append(" ".join(sentences))
+            total += sum(len(s.split()) for s in sentences)
+        return "\n\n".join(paragraphs)
+
+    def create_exams(self, count, min_questions, max_questions):
+        types, weights = zip(*QUESTION_TYPE_WEIGHTS)
+        exams = ReadingExam.objects.bulk_create([
+            ReadingExam(
+                title=f"{self.prefix} Reading Test {i + 1}",
+                description=self.sentence(10, 20),
+                passage_text=self.passage(),
+                time_limit_minutes=self.rng.choice([20, 20, 40, 60]),
+            )
+            for i in range(count)
+        ], batch_size=self.batch_size)
+
+        questions = []
+        for exam in exams:
+            for order in range(1, self.rng.randint(min_questions, max_questions) + 1):
+                question_type = self.rng.choices(types, weights)[0]
+                question = Question(exam=exam, question_type=question_type, order=order,
+                                    text=self.sentence(8, 18)[:-1] + "?")
+                if question_type in ('fill_blank', 'sentence_completion'):
+                    question.correct_answer_text = self.words(self.rng.randint(1, 3))
+                elif question_type == 'matching':
+                    question.matching_pairs = [
+                        {'left': self.words(2), 'right': chr(ord('A') + idx)}
+                        for idx in range(self.rng.randint(3, 5))
+                    ]
+                questions.append(question)
+        Question.objects.bulk_create(questions, batch_size=self.batch_size)
+
+        choices, choice_texts = [], {}
+        for question in questions:
+            if question.question_type == 'true_false_ng':
+                correct = self.rng.randrange(3)
+                texts = [(text, idx == correct) for idx, text in enumerate(TFNG_CHOICES)]
+            elif question.question_type == 'single_choice':
+                correct = self.rng.randrange(4)
+                texts = [(self.words(self.rng.randint(2, 6)), idx == correct) for idx in range(4)]
+            elif question.question_type == 'multiple_choice':
+                correct = set(self.rng.sample(range(5), 2))
+                texts = [(self.words(self.rng.randint(2, 6)), idx in correct) for idx in range(5)]
+            else:
+                continue
+            choice_texts[question.id] = texts
+            choices.extend(
+                Choice(question=question, text=text, is_correct=is_correct, order=idx + 1)
+                for idx, (text, is_correct) in enumerate(texts)
+            )
+        Choice.objects.bulk_create(choices, batch_size=self.batch_size)
+
+        # Для answers_detail: (id, текст, тип, правильный ответ, неправильные ответы)
+        exam_questions = {exam.id: [] for exam in exams}
+        for question in questions:
+            if question.question_type in ('fill_blank', 'sentence_completion'):
+                right, wrong = question.correct_answer_text, [self.words(2) for _ in range(3)]
+            elif question.question_type == 'matching':
+                pairs = question.matching_pairs
+                right = "; ".join(f"{p['left']} → {p['right']}" for p in pairs)
+                wrong = ["; ".join(f"{p['left']} → {p['right']}" for p in pairs[::-1])]
+            elif question.question_type == 'multiple_choice':
+                right = ", ".join(text for text, ok in choice_texts[question.id] if ok)
+                wrong = [text for text, ok in choice_texts[question.id] if not ok]
+            else:
+                right = next(text for text, ok in choice_texts[question.id] if ok)
+                wrong = [text for text, ok in choice_texts[question.id] if not ok]
+            exam_questions[question.exam_id].append(
+                (question.id, question.text, question.question_type, right, wrong)
+            )
+
+        return [exam.id for exam in exams], exam_questions
+
+    def create_users(self, count):
+        # Хэш один на всех: PBKDF2 на каждого пользователя занял бы часы
+        password = make_password('student12345')
+        users = [
+            User(username=f"{self.prefix}_{i:07d}", password=password)
+            for i in range(count)
+        ]
+        User.objects.bulk_create(users, batch_size=self.batch_size)
+        return list(
+            User.objects.filter(username__startswith=f"{self.prefix}_").order_by('id').values_list('id', flat=True)
+        )
+
+    def answers(self, questions, skill):
+        detail, score = [], 0
+        for question_id, text, question_type, right, wrong in questions:
+            roll = self.rng.random()
+            is_correct = roll < skill
+            if is_correct:
+                score += 1
+                user_answer = right
+            elif roll > 0.97:
+                user_answer = None
+            else:
+                user_answer = self.rng.choice(wrong)
+            detail.append({
+                'question_id': question_id,
+                'question_text': text,
+                'question_type': question_type,
+                'user_answer': user_answer,
+                'is_correct': is_correct,
+            })
+        return detail, score
+
+    def create_results(self, user_ids, exam_ids, exam_questions, total, days, started):
+        now = timezone.now()
+        per_user, extra = divmod(total, len(user_ids))
+        window = days * 24 * 60 * 60
+        results, sessions, created = [], [], 0
+
+        for idx, user_id in enumerate(user_ids):
+            taken = per_user + (1 if idx < extra else 0)
+            if not taken:
+                continue
+            skill = self.rng.betavariate(5, 3)
+
+            for exam_id in self.rng.sample(exam_ids, taken):
+                questions = exam_questions[exam_id]
+                started_at = now - timedelta(seconds=self.rng.randrange(window))
+                completed_at = started_at + timedelta(seconds=self.rng.randint(300, 3600))
+                detail, score = self.answers(questions, skill)
+                total_questions = len(questions)
+
+                sessions.append(ExamSession(student_id=user_id, exam_id=exam_id,
+                                            started_at=started_at, is_active=False))
+                results.append(StudentResult(
+                    student_id=user_id,
+                    exam_id=exam_id,
+                    score=score,
+                    total_questions=total_questions,
+                    percentage=(score / total_questions) * 100 if total_questions > 0 else 0,
+                    completed_at=completed_at,
+                    answers_detail=detail,
+                ))
+
+                if len(results) >= self.batch_size:
+                    created += self.flush(sessions, results)
+                    if created % (self.batch_size * 20) == 0:
+                        self.log(f"  ... {created}/{total}", started)
+
+        return created + self.flush(sessions, results)
+
+    def flush(self, sessions, results):
+        with transaction.atomic():
+            ExamSession.objects.bulk_create(sessions, batch_size=self.batch_size)
+            StudentResult.objects.bulk_create(results, batch_size=self.batch_size)
+        count = len(results)
+        sessions.clear()
+        results.clear()
+        return count
+
+    def create_active_sessions(self, user_ids, exam_ids, count):
+        now = timezone.now()
+        sessions = []
+        for user_id in self.rng.sample(user_ids, min(count, len(user_ids))):
+            taken = set(ExamSession.objects.filter(student_id=user_id).values_list('exam_id', flat=True))
+            free = [exam_id for exam_id in exam_ids if exam_id not in taken]
+            if not free:
+                continue
+            sessions.append(ExamSession(student_id=user_id, exam_id=self.rng.choice(free), is_active=True,
+                                        started_at=now - timedelta(seconds=self.rng.randrange(1200))))
+        ExamSession.objects.bulk_create(sessions, batch_size=self.batch_size)
+        return len(sessions)
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.exam_cache import cache_is_process_local, exams_to_prewarm, warm_exam
+
+
+class Command(BaseCommand):
+    help = (
+        "Загружает в общий кэш вопросы и текст экзаменов, окно которых скоро откроется. "
+        "Требует общий кэш (REDIS_URL); без него воркеры прогреваются сами, см. gunicorn.conf.py"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--minutes',
+            type=int,
+            default=15,
+            help="За сколько минут до открытия окна прогревать экзамен (по умолчанию 15)"
+        )
+
+    def handle(self, *args, **options):
+        if cache_is_process_local():
+            raise CommandError(
+                "Кэш локален для процесса (REDIS_URL не задан): прогрев из этой команды не дойдет до воркеров "
+                "gunicorn. Задайте REDIS_URL или полагайтесь на прогрев внутри воркеров (gunicorn.conf.py)."
+            )
+
+        connection.ensure_connection()
+
+        warmed = 0
+        for exam in exams_to_prewarm(options['minutes']):
+            content = warm_exam(exam)
+            warmed += 1
+            self.stdout.write(f"🔥 {exam.title}: {len(content['sections'])} секц., {content['question_count']} вопрос(ов), открытие {exam.opens_at}")
+
+        self.stdout.write(self.style.SUCCESS(f"Прогрето экзаменов: {warmed}"))
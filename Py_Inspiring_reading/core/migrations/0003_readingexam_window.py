@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_alter_choice_options_choice_order_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='readingexam',
+            name='closes_at',
+            field=models.DateTimeField(blank=True, help_text='Конец окна сдачи. Пусто — без ограничения', null=True, verbose_name='Закрывается'),
+        ),
+        migrations.AddField(
+            model_name='readingexam',
+            name='opens_at',
+            field=models.DateTimeField(blank=True, help_text='Начало окна сдачи. Пусто — экзамен доступен сразу', null=True, verbose_name='Открывается'),
+        ),
+    ]
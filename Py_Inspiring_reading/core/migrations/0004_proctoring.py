@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_readingexam_window'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProctoringEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'Переключение вкладки'), (2, 'Потеря фокуса'), (3, 'Вставка текста'), (4, 'Время на вопросе')], verbose_name='Тип события')),
+                ('offset_ms', models.PositiveIntegerField(verbose_name='Мс от начала сессии')),
+                ('value', models.PositiveIntegerField(default=0, help_text='Для времени на вопросе — длительность в мс', verbose_name='Значение')),
+                ('question', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.question')),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='proctoring_events', to='core.examsession')),
+            ],
+            options={
+                'verbose_name': 'Событие прокторинга',
+                'verbose_name_plural': 'События прокторинга',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProctoringSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tab_switches', models.PositiveIntegerField(default=0, verbose_name='Переключений вкладки')),
+                ('focus_losses', models.PositiveIntegerField(default=0, verbose_name='Потерь фокуса')),
+                ('pastes', models.PositiveIntegerField(default=0, verbose_name='Вставок текста')),
+                ('dwell_ms', models.JSONField(blank=True, default=dict, verbose_name='Время по вопросам (мс)')),
+                ('last_event_ms', models.PositiveIntegerField(default=0, verbose_name='Последнее событие (мс)')),
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='proctoring_summary', to='core.examsession')),
+            ],
+            options={
+                'verbose_name': 'Сводка прокторинга',
+                'verbose_name_plural': 'Сводки прокторинга',
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_proctoring'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamActivityDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('submissions', models.PositiveIntegerField(default=0, verbose_name='Сдач')),
+                ('percentage_sum', models.FloatField(default=0, verbose_name='Сумма процентов')),
+                ('sessions_started', models.PositiveIntegerField(default=0, verbose_name='Начатых сессий')),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to='core.readingexam')),
+            ],
+            options={
+                'verbose_name': 'Активность за день',
+                'verbose_name_plural': 'Активность по дням',
+                'ordering': ['day'],
+                'unique_together': {('exam', 'day')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ExamActivityHourly',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='Час')),
+                ('submissions', models.PositiveIntegerField(default=0, verbose_name='Сдач')),
+                ('percentage_sum', models.FloatField(default=0, verbose_name='Сумма процентов')),
+                ('sessions_started', models.PositiveIntegerField(default=0, verbose_name='Начатых сессий')),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_activity', to='core.readingexam')),
+            ],
+            options={
+                'verbose_name': 'Активность за час',
+                'verbose_name_plural': 'Активность по часам',
+                'ordering': ['hour'],
+                'unique_together': {('exam', 'hour')},
+            },
+        ),
+    ]
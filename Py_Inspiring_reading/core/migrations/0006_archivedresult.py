@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_activity_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('result_id', models.BigIntegerField(unique=True, verbose_name='ID исходного результата')),
+                ('score', models.IntegerField(verbose_name='Баллы')),
+                ('total_questions', models.IntegerField(verbose_name='Всего вопросов')),
+                ('percentage', models.FloatField(verbose_name='Процент')),
+                ('completed_at', models.DateTimeField()),
+                ('archive_path', models.CharField(max_length=255, verbose_name='Файл архива')),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.readingexam')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Архивный результат',
+                'verbose_name_plural': 'Архивные результаты',
+                'ordering': ['-completed_at'],
+                'unique_together': {('student', 'exam')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_archivedresult'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Всего отчетов')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Готово отчетов')),
+                ('archive_path', models.CharField(blank=True, max_length=255, verbose_name='Файл zip')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to='core.readingexam')),
+            ],
+            options={
+                'verbose_name': 'Генерация отчетов',
+                'verbose_name_plural': 'Генерация отчетов',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
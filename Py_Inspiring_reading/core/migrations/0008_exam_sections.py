@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='readingexam',
+            name='content_version',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Увеличивается при любом изменении текста или вопросов — часть ключа кэша секций', verbose_name='Версия контента'),
+        ),
+        migrations.AlterField(
+            model_name='readingexam',
+            name='passage_text',
+            field=models.TextField(blank=True, help_text='Для экзамена из одного текста. Если добавлены секции, используются их тексты', verbose_name='Текст для чтения (Passage)'),
+        ),
+        migrations.CreateModel(
+            name='ExamSection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order', models.IntegerField(default=1, verbose_name='Порядковый номер')),
+                ('title', models.CharField(blank=True, max_length=200, verbose_name='Заголовок')),
+                ('passage_text', models.TextField(verbose_name='Текст для чтения (Passage)')),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sections', to='core.readingexam')),
+            ],
+            options={
+                'verbose_name': 'Секция',
+                'verbose_name_plural': 'Секции',
+                'ordering': ['order'],
+                'unique_together': {('exam', 'order')},
+            },
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='section',
+            field=models.ForeignKey(blank=True, help_text='Пусто — вопрос относится к первой секции', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='questions', to='core.examsection', verbose_name='Секция'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_exam_sections'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedresult',
+            name='session_started_at',
+            field=models.DateTimeField(blank=True, help_text='Для сводок активности: сама сессия тоже уходит в архив', null=True, verbose_name='Начало сессии'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_archivedresult_session_started_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reportjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Обновляется процессом генерации; без обновлений дольше STALE_AFTER задача считается упавшей', null=True, verbose_name='Последний сигнал'),
+        ),
+        migrations.AddField(
+            model_name='reportjob',
+            name='pid',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='PID процесса'),
+        ),
+    ]
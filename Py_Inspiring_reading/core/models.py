@@ -1,4 +1,8 @@
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import User
 from django.utils import timezone
 
@@ -6,13 +10,57 @@ from django.utils import timezone
 class ReadingExam(models.Model):
     title = models.CharField("Название теста", max_length=200)
     description = models.TextField("Описание", blank=True)
-    passage_text = models.TextField("Текст для чтения (Passage)")
+    passage_text = models.TextField(
+        "Текст для чтения (Passage)",
+        blank=True,
+        help_text="Для экзамена из одного текста. Если добавлены секции, используются их тексты"
+    )
     time_limit_minutes = models.IntegerField("Время (минуты)", default=20)
+    opens_at = models.DateTimeField(
+        "Открывается",
+        blank=True,
+        null=True,
+        help_text="Начало окна сдачи. Пусто — экзамен доступен сразу"
+    )
+    closes_at = models.DateTimeField(
+        "Закрывается",
+        blank=True,
+        null=True,
+        help_text="Конец окна сдачи. Пусто — без ограничения"
+    )
+    content_version = models.PositiveIntegerField(
+        "Версия контента",
+        default=1,
+        editable=False,
+        help_text="Увеличивается при любом изменении текста или вопросов — часть ключа кэша секций"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.title
 
+    def window_status(self, now=None):
+        """Состояние окна сдачи: 'upcoming', 'open' или 'closed'"""
+        now = now or timezone.now()
+        if self.opens_at and now < self.opens_at:
+            return 'upcoming'
+        if self.closes_at and now >= self.closes_at:
+            return 'closed'
+        return 'open'
+
+    def is_open(self, now=None):
+        return self.window_status(now) == 'open'
+
+    def save(self, *args, **kwargs):
+        # content_version увеличивают только сигналы через update(): сохранение объекта,
+        # загруженного до правки вопросов, не должно откатить версию назад
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'content_version'
+            ]
+        super().save(*args, **kwargs)
+
     def get_question_types_summary(self):
         """Возвращает сводку по типам вопросов"""
         questions = self.questions.all()
@@ -27,6 +75,23 @@ class ReadingExam(models.Model):
         verbose_name_plural = "Экзамены"
 
 
+class ExamSection(models.Model):
+    """Один текст экзамена со своей группой вопросов (IELTS: обычно три секции)"""
+    exam = models.ForeignKey(ReadingExam, related_name='sections', on_delete=models.CASCADE)
+    order = models.IntegerField("Порядковый номер", default=1)
+    title = models.CharField("Заголовок", max_length=200, blank=True)
+    passage_text = models.TextField("Текст для чтения (Passage)")
+
+    def __str__(self):
+        return f"{self.exam.title} - Passage {self.order}"
+
+    class Meta:
+        ordering = ['order']
+        unique_together = ['exam', 'order']
+        verbose_name = "Секция"
+        verbose_name_plural = "Секции"
+
+
 class Question(models.Model):
     QUESTION_TYPES = [
         ('single_choice', 'Multiple Choice (один ответ)'),
@@ -38,6 +103,15 @@ class Question(models.Model):
     ]
 
     exam = models.ForeignKey(ReadingExam, related_name='questions', on_delete=models.CASCADE)
+    section = models.ForeignKey(
+        ExamSection,
+        related_name='questions',
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        verbose_name="Секция",
+        help_text="Пусто — вопрос относится к первой секции"
+    )
     question_type = models.CharField(
         "Тип вопроса",
         max_length=20,
@@ -63,6 +137,11 @@ class Question(models.Model):
         help_text='Формат: [{"left": "A", "right": "1"}, {"left": "B", "right": "2"}]'
     )
 
+    def clean(self):
+        # Иначе build_exam_content молча перенесет вопрос в первую секцию
+        if self.section_id and self.exam_id and self.section.exam_id != self.exam_id:
+            raise ValidationError({'section': "Секция относится к другому экзамену"})
+
     def __str__(self):
         return f"{self.exam.title} - Q{self.order} ({self.get_question_type_display()})"
 
@@ -128,4 +207,167 @@ class ExamSession(models.Model):
     class Meta:
         unique_together = ['student', 'exam']
         verbose_name = "Сессия экзамена"
-        verbose_name_plural = "Сессии экзаменов"
\ No newline at end of file
+        verbose_name_plural = "Сессии экзаменов"
+
+
+class ProctoringEvent(models.Model):
+    """Сырые события прокторинга. Только добавление, поэтому хранятся компактно"""
+    TAB_SWITCH = 1
+    FOCUS_LOSS = 2
+    PASTE = 3
+    DWELL = 4
+    KINDS = [
+        (TAB_SWITCH, 'Переключение вкладки'),
+        (FOCUS_LOSS, 'Потеря фокуса'),
+        (PASTE, 'Вставка текста'),
+        (DWELL, 'Время на вопросе'),
+    ]
+
+    session = models.ForeignKey(ExamSession, related_name='proctoring_events', on_delete=models.CASCADE)
+    kind = models.PositiveSmallIntegerField("Тип события", choices=KINDS)
+    question = models.ForeignKey(Question, null=True, blank=True, on_delete=models.SET_NULL, db_constraint=False)
+    offset_ms = models.PositiveIntegerField("Мс от начала сессии")
+    value = models.PositiveIntegerField("Значение", default=0, help_text="Для времени на вопросе — длительность в мс")
+
+    def __str__(self):
+        return f"{self.session} - {self.get_kind_display()} (+{self.offset_ms} мс)"
+
+    class Meta:
+        verbose_name = "Событие прокторинга"
+        verbose_name_plural = "События прокторинга"
+
+
+class ProctoringSummary(models.Model):
+    """Сводка по сессии, обновляется при каждом пакете событий"""
+    session = models.OneToOneField(ExamSession, related_name='proctoring_summary', on_delete=models.CASCADE)
+    tab_switches = models.PositiveIntegerField("Переключений вкладки", default=0)
+    focus_losses = models.PositiveIntegerField("Потерь фокуса", default=0)
+    pastes = models.PositiveIntegerField("Вставок текста", default=0)
+    dwell_ms = models.JSONField("Время по вопросам (мс)", default=dict, blank=True)
+    last_event_ms = models.PositiveIntegerField("Последнее событие (мс)", default=0)
+
+    def __str__(self):
+        return f"{self.session} - {self.focus_losses} потерь фокуса"
+
+    class Meta:
+        verbose_name = "Сводка прокторинга"
+        verbose_name_plural = "Сводки прокторинга"
+
+
+class ExamActivityHourly(models.Model):
+    """Почасовая сводка активности по экзамену для графиков"""
+    exam = models.ForeignKey(ReadingExam, related_name='hourly_activity', on_delete=models.CASCADE)
+    hour = models.DateTimeField("Час")
+    submissions = models.PositiveIntegerField("Сдач", default=0)
+    percentage_sum = models.FloatField("Сумма процентов", default=0)
+    sessions_started = models.PositiveIntegerField("Начатых сессий", default=0)
+
+    def __str__(self):
+        return f"{self.exam.title} - {self.hour:%Y-%m-%d %H:00}"
+
+    class Meta:
+        ordering = ['hour']
+        unique_together = ['exam', 'hour']
+        verbose_name = "Активность за час"
+        verbose_name_plural = "Активность по часам"
+
+
+class ExamActivityDaily(models.Model):
+    """Дневная сводка активности по экзамену для графиков"""
+    exam = models.ForeignKey(ReadingExam, related_name='daily_activity', on_delete=models.CASCADE)
+    day = models.DateField("День")
+    submissions = models.PositiveIntegerField("Сдач", default=0)
+    percentage_sum = models.FloatField("Сумма процентов", default=0)
+    sessions_started = models.PositiveIntegerField("Начатых сессий", default=0)
+
+    @property
+    def avg_percentage(self):
+        return self.percentage_sum / self.submissions if self.submissions else 0
+
+    def __str__(self):
+        return f"{self.exam.title} - {self.day}"
+
+    class Meta:
+        ordering = ['day']
+        unique_together = ['exam', 'day']
+        verbose_name = "Активность за день"
+        verbose_name_plural = "Активность по дням"
+
+
+class ArchivedResult(models.Model):
+    """Индекс результатов, перенесенных в архив командой archive_old_attempts.
+    Полные данные (answers_detail) лежат в сжатом JSONL-файле archive_path"""
+    result_id = models.BigIntegerField("ID исходного результата", unique=True)
+    student = models.ForeignKey(User, on_delete=models.CASCADE)
+    exam = models.ForeignKey(ReadingExam, on_delete=models.CASCADE)
+    score = models.IntegerField("Баллы")
+    total_questions = models.IntegerField("Всего вопросов")
+    percentage = models.FloatField("Процент")
+    completed_at = models.DateTimeField()
+    session_started_at = models.DateTimeField(
+        "Начало сессии",
+        blank=True,
+        null=True,
+        help_text="Для сводок активности: сама сессия тоже уходит в архив"
+    )
+    archive_path = models.CharField("Файл архива", max_length=255)
+
+    def __str__(self):
+        return f"{self.student.username} - {self.exam.title} (архив)"
+
+    class Meta:
+        ordering = ['-completed_at']
+        verbose_name = "Архивный результат"
+        verbose_name_plural = "Архивные результаты"
+        unique_together = ['student', 'exam']
+
+
+class ReportJob(models.Model):
+    """Фоновая генерация отчетов по всем студентам экзамена"""
+    STATUSES = [
+        ('pending', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Готово'),
+        ('failed', 'Ошибка'),
+    ]
+
+    exam = models.ForeignKey(ReadingExam, related_name='report_jobs', on_delete=models.CASCADE)
+    created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    status = models.CharField("Статус", max_length=10, choices=STATUSES, default='pending')
+    total = models.PositiveIntegerField("Всего отчетов", default=0)
+    processed = models.PositiveIntegerField("Готово отчетов", default=0)
+    archive_path = models.CharField("Файл zip", max_length=255, blank=True)
+    error = models.TextField("Ошибка", blank=True)
+    pid = models.PositiveIntegerField("PID процесса", null=True, blank=True)
+    heartbeat_at = models.DateTimeField(
+        "Последний сигнал",
+        null=True,
+        blank=True,
+        help_text="Обновляется процессом генерации; без обновлений дольше STALE_AFTER задача считается упавшей"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # Пачка отчетов рендерится секунды, так что 10 минут тишины — процесс точно умер
+    STALE_AFTER = timedelta(minutes=10)
+
+    def progress(self):
+        return round(self.processed / self.total * 100) if self.total else 0
+
+    @classmethod
+    def mark_stale(cls, now=None):
+        """Переводит в failed задачи, процесс которых умер, не успев записать статус"""
+        now = now or timezone.now()
+        deadline = now - cls.STALE_AFTER
+        return cls.objects.filter(
+            Q(heartbeat_at__lt=deadline) | Q(heartbeat_at__isnull=True, created_at__lt=deadline),
+            status__in=['pending', 'running'],
+        ).update(status='failed', error="Процесс генерации перестал отвечать", finished_at=now)
+
+    def __str__(self):
+        return f"{self.exam.title} - {self.get_status_display()} ({self.processed}/{self.total})"
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Генерация отчетов"
+        verbose_name_plural = "Генерация отчетов"
@@ -0,0 +1,108 @@
+from django.db import transaction
+from django.db.models import F
+
+from .models import ProctoringEvent, ProctoringSummary
+
+# Клиент сбрасывает буфер каждые несколько секунд, больше этого в пакете не бывает
+MAX_BATCH_SIZE = 200
+
+EVENT_KINDS = {
+    'tab_switch': ProctoringEvent.TAB_SWITCH,
+    'focus_loss': ProctoringEvent.FOCUS_LOSS,
+    'paste': ProctoringEvent.PASTE,
+    'dwell': ProctoringEvent.DWELL,
+}
+
+# Верхняя граница PositiveIntegerField в PostgreSQL
+MAX_INT = 2 ** 31 - 1
+
+# Поле сводки, которое увеличивается для каждого типа события
+SUMMARY_COUNTERS = {
+    ProctoringEvent.TAB_SWITCH: 'tab_switches',
+    ProctoringEvent.FOCUS_LOSS: 'focus_losses',
+    ProctoringEvent.PASTE: 'pastes',
+}
+
+
+def _non_negative_int(value, field):
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= MAX_INT:
+        raise ValueError(f"Поле '{field}' должно быть целым числом от 0 до {MAX_INT}")
+    return value
+
+
+def parse_batch(payload, session, question_ids):
+    """Проверяет пакет от клиента и возвращает несохраненные ProctoringEvent.
+
+    Формат: {"events": [{"type": "paste", "q": 12, "t": 5300, "v": 0}, ...]},
+    где t — мс от начала сессии, v — длительность для dwell.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get('events'), list):
+        raise ValueError("Ожидается объект с массивом 'events'")
+
+    raw_events = payload['events']
+    if len(raw_events) > MAX_BATCH_SIZE:
+        raise ValueError(f"Слишком много событий в пакете (максимум {MAX_BATCH_SIZE})")
+
+    events = []
+    for raw in raw_events:
+        if not isinstance(raw, dict):
+            raise ValueError("Каждое событие должно быть объектом")
+
+        kind = EVENT_KINDS.get(raw.get('type'))
+        if kind is None:
+            raise ValueError(f"Неизвестный тип события: {raw.get('type')!r}")
+
+        question_id = raw.get('q')
+        if question_id is not None and question_id not in question_ids:
+            raise ValueError(f"Вопрос {question_id!r} не относится к экзамену")
+        if kind == ProctoringEvent.DWELL and question_id is None:
+            raise ValueError("Для dwell нужен вопрос")
+
+        events.append(ProctoringEvent(
+            session=session,
+            kind=kind,
+            question_id=question_id,
+            offset_ms=_non_negative_int(raw.get('t'), 't'),
+            value=_non_negative_int(raw.get('v', 0), 'v'),
+        ))
+    return events
+
+
+def record_batch(session, events):
+    """Одной вставкой пишет события и инкрементально обновляет сводку сессии"""
+    if not events:
+        return 0
+
+    counters = {}
+    dwell = {}
+    for event in events:
+        field = SUMMARY_COUNTERS.get(event.kind)
+        if field:
+            counters[field] = counters.get(field, 0) + 1
+        elif event.kind == ProctoringEvent.DWELL:
+            key = str(event.question_id)
+            dwell[key] = dwell.get(key, 0) + event.value
+    last_event_ms = max(event.offset_ms for event in events)
+
+    with transaction.atomic():
+        ProctoringEvent.objects.bulk_create(events)
+        summary, _ = ProctoringSummary.objects.select_for_update().get_or_create(session=session)
+
+        if counters:
+            ProctoringSummary.objects.filter(pk=summary.pk).update(
+                **{field: F(field) + count for field, count in counters.items()}
+            )
+
+        # JSON нельзя увеличить через F(), но строка уже заблокирована
+        update_fields = []
+        if dwell:
+            for key, ms in dwell.items():
+                summary.dwell_ms[key] = summary.dwell_ms.get(key, 0) + ms
+            update_fields.append('dwell_ms')
+        if last_event_ms > summary.last_event_ms:
+            summary.last_event_ms = last_event_ms
+            update_fields.append('last_event_ms')
+        if update_fields:
+            summary.save(update_fields=update_fields)
+
+    return len(events)
@@ -0,0 +1,116 @@
+import os
+import subprocess
+import sys
+import threading
+import zipfile
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .archive import load_archived_details
+from .models import ArchivedResult, ReportJob, StudentResult
+
+# Сколько отчетов рендерит воркер за одну задачу — меньше накладных расходов на pickle
+CHUNK_SIZE = 50
+
+
+def collect_cohort(exam):
+    """Все данные для отчетов: рабочие результаты одним запросом, архивные — из индекса и файлов партиций.
+    Возвращает простые dict, чтобы их можно было отдать в процессы"""
+    fields = ('student_id', 'score', 'total_questions', 'percentage', 'completed_at', 'student__username')
+    results = [
+        (r.student_id, r.student.username, r, r.answers_detail)
+        for r in StudentResult.objects.filter(exam=exam).select_related('student').only(*fields, 'answers_detail')
+    ]
+    archived = list(ArchivedResult.objects.filter(exam=exam).select_related('student').only(*fields, 'result_id', 'archive_path'))
+    details = load_archived_details(archived)
+    results += [
+        (r.student_id, r.student.username, r, details.get(r.result_id, {}).get('answers_detail'))
+        for r in archived
+    ]
+    results.sort(key=lambda item: item[1])
+
+    percentages = sorted(r.percentage for _, _, r, _ in results)
+    cohort_size = len(percentages)
+
+    return [
+        {
+            'exam_title': exam.title,
+            'username': username,
+            # Разные логины могут дать одно имя файла после get_valid_filename
+            'filename': f"{student_id}_{get_valid_filename(username)}.html",
+            'score': r.score,
+            'total_questions': r.total_questions,
+            'percentage': r.percentage,
+            'completed_at': r.completed_at,
+            'answers': answers or [],
+            # Доля студентов с результатом ниже
+            'percentile': round(bisect_left(percentages, r.percentage) / cohort_size * 100),
+            'cohort_size': cohort_size,
+        }
+        for student_id, username, r, answers in results
+    ]
+
+
+def render_chunk(rows):
+    """Выполняется в процессе пула"""
+    return [
+        (row['filename'], render_to_string('Student_Report.html', {'report': row}))
+        for row in rows
+    ]
+
+
+def run_report_job(job, workers=None):
+    """Рендерит отчеты в пуле процессов и складывает их в zip"""
+    ReportJob.objects.filter(pk=job.pk).update(status='running', pid=os.getpid(), heartbeat_at=timezone.now())
+    try:
+        rows = collect_cohort(job.exam)
+        ReportJob.objects.filter(pk=job.pk).update(total=len(rows))
+
+        relative_path = Path(f"exam_{job.exam_id}_job_{job.pk}.zip")
+        zip_path = Path(settings.REPORTS_ROOT) / relative_path
+        zip_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Дочерние процессы не должны наследовать открытые соединения с БД
+        connections.close_all()
+
+        processed = 0
+        chunks = [rows[i:i + CHUNK_SIZE] for i in range(0, len(rows), CHUNK_SIZE)]
+        with zipfile.ZipFile(zip_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive, \
+                ProcessPoolExecutor(max_workers=workers) as pool:
+            archive.writestr('index.html', render_to_string('Cohort_Report.html', {'exam': job.exam, 'cohort': rows}))
+            for future in as_completed([pool.submit(render_chunk, chunk) for chunk in chunks]):
+                for filename, html in future.result():
+                    archive.writestr(filename, html)
+                    processed += 1
+                ReportJob.objects.filter(pk=job.pk).update(processed=processed, heartbeat_at=timezone.now())
+
+        ReportJob.objects.filter(pk=job.pk).update(
+            status='done', archive_path=str(relative_path), finished_at=timezone.now()
+        )
+    except Exception as e:
+        ReportJob.objects.filter(pk=job.pk).update(status='failed', error=repr(e), finished_at=timezone.now())
+        raise
+
+
+def start_report_job(exam, user=None):
+    """Создает задачу и запускает generate_cohort_reports отдельным процессом, не блокируя воркер.
+
+    Если процесс умрет, не записав статус, задачу закроет ReportJob.mark_stale по heartbeat_at
+    """
+    job = ReportJob.objects.create(exam=exam, created_by=user)
+    process = subprocess.Popen(
+        [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'generate_cohort_reports', '--job', str(job.pk)],
+        cwd=settings.BASE_DIR,
+        start_new_session=True,
+    )
+    ReportJob.objects.filter(pk=job.pk).update(pid=process.pid)
+    # wait() в фоне забирает код завершения, иначе процесс останется зомби у воркера
+    threading.Thread(target=process.wait, name=f'report-job-{job.pk}', daemon=True).start()
+    return job
@@ -0,0 +1,115 @@
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Exists, F, OuterRef, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import ArchivedResult, ExamActivityDaily, ExamActivityHourly, ExamSession, StudentResult
+
+
+def hour_bucket(moment):
+    """Начало часа в текущей таймзоне — так же режет TruncHour"""
+    return timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+
+
+def _increment(model, lookup, **deltas):
+    """Upsert по (exam, bucket): строку мог пересоздать backfill_rollups, поэтому обновляем не по pk"""
+    increments = {field: F(field) + value for field, value in deltas.items()}
+    if model.objects.filter(**lookup).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Строку успел создать параллельный запрос
+        model.objects.filter(**lookup).update(**increments)
+
+
+def record_submission(result):
+    """Учитывает новый StudentResult в почасовой и дневной сводках"""
+    with transaction.atomic():
+        for model, lookup in (
+            (ExamActivityHourly, {'exam_id': result.exam_id, 'hour': hour_bucket(result.completed_at)}),
+            (ExamActivityDaily, {'exam_id': result.exam_id, 'day': timezone.localdate(result.completed_at)}),
+        ):
+            _increment(model, lookup, submissions=1, percentage_sum=result.percentage)
+
+
+def record_session_start(session):
+    with transaction.atomic():
+        for model, lookup in (
+            (ExamActivityHourly, {'exam_id': session.exam_id, 'hour': hour_bucket(session.started_at)}),
+            (ExamActivityDaily, {'exam_id': session.exam_id, 'day': timezone.localdate(session.started_at)}),
+        ):
+            _increment(model, lookup, sessions_started=1)
+
+
+def _aggregate(model, bucket_field, trunc, since, batch_size):
+    """Пересчитывает одну таблицу сводки агрегацией на стороне БД.
+
+    Учитывает и перенесенные в архив попытки, иначе полный пересчет стер бы их историю
+    """
+    # Сессия архивированной попытки хранится в ArchivedResult.session_started_at
+    has_archived_session = ArchivedResult.objects.filter(
+        student=OuterRef('student'), exam=OuterRef('exam'), session_started_at__isnull=False
+    )
+    result_sources = [(StudentResult.objects.all(), 'completed_at'), (ArchivedResult.objects.all(), 'completed_at')]
+    session_sources = [
+        (ExamSession.objects.filter(~Exists(has_archived_session)), 'started_at'),
+        (ArchivedResult.objects.filter(session_started_at__isnull=False), 'session_started_at'),
+    ]
+
+    rows = {}
+
+    def row_for(exam_id, bucket):
+        if (exam_id, bucket) not in rows:
+            rows[(exam_id, bucket)] = model(exam_id=exam_id, **{bucket_field: bucket})
+        return rows[(exam_id, bucket)]
+
+    for queryset, field in result_sources:
+        if since:
+            queryset = queryset.filter(**{f'{field}__gte': since})
+        for row in (queryset.annotate(bucket=trunc(field)).values('exam_id', 'bucket')
+                    .annotate(submissions=Count('id'), percentage_sum=Sum('percentage')).order_by().iterator()):
+            rollup = row_for(row['exam_id'], row['bucket'])
+            rollup.submissions += row['submissions']
+            rollup.percentage_sum += row['percentage_sum'] or 0
+
+    for queryset, field in session_sources:
+        if since:
+            queryset = queryset.filter(**{f'{field}__gte': since})
+        for row in (queryset.annotate(bucket=trunc(field)).values('exam_id', 'bucket')
+                    .annotate(sessions_started=Count('id')).order_by().iterator()):
+            row_for(row['exam_id'], row['bucket']).sessions_started += row['sessions_started']
+
+    stale = model.objects.all()
+    if since:
+        stale = stale.filter(**{f'{bucket_field}__gte': since if bucket_field == 'hour' else timezone.localdate(since)})
+    stale.delete()
+    model.objects.bulk_create(rows.values(), batch_size=batch_size)
+    return len(rows)
+
+
+def _lock_rollups():
+    """Блокирует запись в сводки до конца транзакции.
+
+    Иначе инкремент из submit_exam между агрегацией и delete/insert потеряется или посчитается дважды.
+    Чтение не блокируется. В SQLite запись и так сериализована.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for model in (ExamActivityHourly, ExamActivityDaily):
+            cursor.execute(f'LOCK TABLE {connection.ops.quote_name(model._meta.db_table)} IN EXCLUSIVE MODE')
+
+
+def backfill_rollups(since=None, batch_size=5000):
+    """Полный (или с `since`) пересчет сводок. Возвращает (часов, дней)"""
+    if since:
+        # Начинаем с границы суток, чтобы дневная сводка пересчиталась целиком
+        since = timezone.localtime(since).replace(hour=0, minute=0, second=0, microsecond=0)
+    with transaction.atomic():
+        # Блокировка до агрегации: транзакции, уже обновившие сводку, успеют закоммитить результат
+        _lock_rollups()
+        hourly = _aggregate(ExamActivityHourly, 'hour', TruncHour, since, batch_size)
+        daily = _aggregate(ExamActivityDaily, 'day', TruncDate, since, batch_size)
+    return hourly, daily
@@ -0,0 +1,27 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .exam_cache import invalidate_exam_content
+from .models import Choice, ExamSection, Question, ReadingExam
+
+
+@receiver([post_save, post_delete], sender=ReadingExam)
+def reset_exam_cache(sender, instance, **kwargs):
+    invalidate_exam_content(instance.id)
+
+
+@receiver([post_save, post_delete], sender=ExamSection)
+def reset_exam_cache_on_section(sender, instance, **kwargs):
+    invalidate_exam_content(instance.exam_id)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def reset_exam_cache_on_question(sender, instance, **kwargs):
+    invalidate_exam_content(instance.exam_id)
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def reset_exam_cache_on_choice(sender, instance, **kwargs):
+    exam_id = Question.objects.filter(id=instance.question_id).values_list('exam_id', flat=True).first()
+    if exam_id:
+        invalidate_exam_content(exam_id)
@@ -1,3 +1,611 @@
-from django.test import TestCase
+import gzip
+import json
+import math
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count
+from django.core.exceptions import ValidationError
+from django.core.management.base import CommandError
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .archive import already_taken, archive_results, load_archived_detail
+from .reports import collect_cohort, start_report_job
+from .gradebook import build_gradebook, sort_gradebook
+from .exam_cache import exam_content_key, exam_section_key, get_exam_content
+from .models import (
+    ArchivedResult, Choice, ExamActivityDaily, ExamSection, ExamActivityHourly, ExamSession, ProctoringEvent, ProctoringSummary, Question,
+    ReadingExam, ReportJob, StudentResult,
+)
+from .proctoring import MAX_BATCH_SIZE, MAX_INT, parse_batch, record_batch
+from .rollups import backfill_rollups, record_session_start, record_submission
+from .views import GRADEBOOK_ROWS_MARKER
+
+
+def make_exam(title='Экзамен', **kwargs):
+    exam = ReadingExam.objects.create(title=title, passage_text='Текст', time_limit_minutes=30, **kwargs)
+    for i in range(2):
+        question = Question.objects.create(exam=exam, text=f'Вопрос {i}')
+        Choice.objects.create(question=question, text='Да', is_correct=True)
+        Choice.objects.create(question=question, text='Нет', is_correct=False)
+    exam.refresh_from_db()
+    return exam
+
+
+class PrewarmExamsTests(TestCase):
+    def test_fails_with_process_local_cache(self):
+        with self.assertRaises(CommandError):
+            call_command('prewarm_exams', stdout=StringIO())
+
+    def test_warms_shared_cache(self):
+        exam = make_exam(opens_at=timezone.now() + timedelta(minutes=5))
+        with tempfile.TemporaryDirectory() as tmp:
+            shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': tmp}}
+            with override_settings(CACHES=shared):
+                call_command('prewarm_exams', stdout=StringIO())
+                self.assertEqual(cache.get(exam_content_key(exam))['question_count'], 2)
+                self.assertIsNotNone(cache.get(exam_section_key(exam, 1)))
+
+
+class ProctoringTests(TestCase):
+    def setUp(self):
+        # id в SQLite переиспользуются после отката, а ключи кэша строятся по id и версии
+        cache.clear()
+        self.exam = make_exam()
+        self.student = User.objects.create_user('student', password='pass')
+        self.session = ExamSession.objects.create(student=self.student, exam=self.exam)
+        self.question_ids = set(self.exam.questions.values_list('id', flat=True))
+        self.q1, self.q2 = sorted(self.question_ids)
+
+    def parse(self, *events):
+        return parse_batch({'events': list(events)}, self.session, self.question_ids)
+
+    def test_parse_valid_batch(self):
+        events = self.parse(
+            {'type': 'paste', 'q': self.q1, 't': 100},
+            {'type': 'dwell', 'q': self.q2, 't': 200, 'v': 1500},
+            {'type': 'tab_switch', 't': 300},
+        )
+        self.assertEqual([e.kind for e in events], [ProctoringEvent.PASTE, ProctoringEvent.DWELL, ProctoringEvent.TAB_SWITCH])
+        self.assertEqual(events[1].value, 1500)
+        self.assertIsNone(events[2].question_id)
+
+    def test_parse_rejects_invalid_batches(self):
+        invalid = [
+            [],
+            {'events': 'paste'},
+            {'events': ['paste']},
+            {'events': [{'type': 'copy', 't': 1}]},
+            {'events': [{'type': 'paste', 'q': 999999, 't': 1}]},
+            {'events': [{'type': 'dwell', 't': 1, 'v': 10}]},
+            {'events': [{'type': 'paste', 't': -1}]},
+            {'events': [{'type': 'paste', 't': 1.5}]},
+            {'events': [{'type': 'paste', 't': True}]},
+            {'events': [{'type': 'paste'}]},
+            {'events': [{'type': 'paste', 't': MAX_INT + 1}]},
+            {'events': [{'type': 'dwell', 'q': self.q1, 't': 1, 'v': MAX_INT + 1}]},
+            {'events': [{'type': 'paste', 't': 1}] * (MAX_BATCH_SIZE + 1)},
+        ]
+        for payload in invalid:
+            with self.subTest(payload=str(payload)[:80]):
+                with self.assertRaises(ValueError):
+                    parse_batch(payload, self.session, self.question_ids)
+
+    def test_parse_accepts_max_int(self):
+        self.assertEqual(self.parse({'type': 'paste', 't': MAX_INT})[0].offset_ms, MAX_INT)
+
+    def test_record_batch_merges_counters_and_dwell(self):
+        record_batch(self.session, self.parse(
+            {'type': 'tab_switch', 't': 100},
+            {'type': 'focus_loss', 't': 150},
+            {'type': 'dwell', 'q': self.q1, 't': 500, 'v': 1000},
+            {'type': 'dwell', 'q': self.q1, 't': 900, 'v': 200},
+        ))
+        record_batch(self.session, self.parse(
+            {'type': 'tab_switch', 't': 50},
+            {'type': 'paste', 'q': self.q2, 't': 700},
+            {'type': 'dwell', 'q': self.q1, 't': 800, 'v': 300},
+            {'type': 'dwell', 'q': self.q2, 't': 850, 'v': 400},
+        ))
+
+        summary = ProctoringSummary.objects.get(session=self.session)
+        self.assertEqual((summary.tab_switches, summary.focus_losses, summary.pastes), (2, 1, 1))
+        self.assertEqual(summary.dwell_ms, {str(self.q1): 1500, str(self.q2): 400})
+        # Более поздний пакет с меньшими смещениями не откатывает последнее событие
+        self.assertEqual(summary.last_event_ms, 900)
+        self.assertEqual(ProctoringEvent.objects.filter(session=self.session).count(), 8)
+
+    def test_record_empty_batch(self):
+        self.assertEqual(record_batch(self.session, []), 0)
+        self.assertFalse(ProctoringSummary.objects.filter(session=self.session).exists())
+
+    def test_events_endpoint_rejects_out_of_range_values(self):
+        self.client.force_login(self.student)
+        url = f'/exam/{self.exam.id}/events/'
+        response = self.client.post(url, {'events': [{'type': 'paste', 't': MAX_INT + 1}]}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, {'events': [{'type': 'paste', 't': 10}]}, content_type='application/json')
+        self.assertEqual(response.json(), {'accepted': 1})
+
+
+class GenerateDatasetTests(TestCase):
+    def generate(self, prefix, seed=7):
+        call_command(
+            'generate_dataset', exams=3, users=6, results=12, questions=[3, 5], days=10,
+            active_sessions=3, batch_size=4, seed=seed, prefix=prefix, stdout=StringIO(),
+        )
+        exams = list(ReadingExam.objects.filter(title__startswith=f'{prefix} ').order_by('id').values_list('id', flat=True))
+        users = list(User.objects.filter(username__startswith=f'{prefix}_').order_by('id').values_list('id', flat=True))
+        results = StudentResult.objects.filter(exam_id__in=exams).order_by('id')
+        sessions = ExamSession.objects.filter(exam_id__in=exams)
+        # id у двух прогонов разные, поэтому сравниваем позиции экзаменов и студентов
+        return {
+            'questions': [Question.objects.filter(exam_id=exam_id).count() for exam_id in exams],
+            'results': [
+                (users.index(r.student_id), exams.index(r.exam_id), r.score, r.total_questions, r.percentage,
+                 [a['user_answer'] for a in r.answers_detail])
+                for r in results
+            ],
+            'sessions': sessions.count(),
+            'active_sessions': sessions.filter(is_active=True).count(),
+        }
+
+    def test_same_seed_is_reproducible(self):
+        first = self.generate('a')
+        second = self.generate('b')
+        self.assertEqual(first, second)
+        self.assertEqual(len(first['results']), 12)
+        self.assertEqual(first['sessions'], 12 + first['active_sessions'])
+        self.assertNotEqual(first['results'], self.generate('c', seed=8)['results'])
+
+    def test_respects_unique_together(self):
+        self.generate('a')
+        for model in (StudentResult, ExamSession):
+            with self.subTest(model=model.__name__):
+                duplicates = model.objects.values('student', 'exam').annotate(n=Count('id')).filter(n__gt=1)
+                self.assertFalse(duplicates.exists())
+
+    def test_rejects_more_results_than_pairs(self):
+        with self.assertRaises(CommandError):
+            call_command('generate_dataset', exams=2, users=2, results=5, prefix='x', stdout=StringIO())
+
+
+def rollup_snapshot():
+    return {
+        model.__name__: sorted(
+            (row[0], row[1], row[2], round(row[3], 6), row[4])
+            for row in model.objects.values_list('exam_id', bucket, 'submissions', 'percentage_sum', 'sessions_started')
+        )
+        for model, bucket in ((ExamActivityHourly, 'hour'), (ExamActivityDaily, 'day'))
+    }
+
+
+class AttemptsTestCase(TestCase):
+    """Попытки с заданным временем; архив пишется во временный каталог"""
+    def setUp(self):
+        self.exams = [make_exam('Первый'), make_exam('Второй')]
+        self.now = timezone.now()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        settings_override = override_settings(ARCHIVE_ROOT=Path(tmp.name))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def take(self, username, exam, hours_ago, percentage=None):
+        """Сессия и (если задан процент) результат, учтенные инкрементально, как во views"""
+        student = User.objects.get_or_create(username=username)[0]
+        started_at = self.now - timedelta(hours=hours_ago)
+        session = ExamSession.objects.create(student=student, exam=exam)
+        ExamSession.objects.filter(pk=session.pk).update(started_at=started_at)
+        session.refresh_from_db()
+        record_session_start(session)
+        if percentage is not None:
+            result = StudentResult.objects.create(
+                student=student, exam=exam, score=1, total_questions=2, percentage=percentage,
+                completed_at=started_at + timedelta(minutes=30),
+            )
+            record_submission(result)
+            ExamSession.objects.filter(pk=session.pk).update(is_active=False)
+
+    def fill(self):
+        self.take('a', self.exams[0], 0, 50)
+        self.take('b', self.exams[0], 0, 100)
+        self.take('c', self.exams[0], 3, 12.5)
+        self.take('a', self.exams[1], 30, 75)
+        self.take('b', self.exams[1], 30)
+        self.take('c', self.exams[1], 80, 0)
+
+
+class RollupTests(AttemptsTestCase):
+    def test_incremental_counts_match_full_backfill(self):
+        self.fill()
+        incremental = rollup_snapshot()
+        self.assertEqual(sum(row[2] for row in incremental['ExamActivityDaily']), 5)
+
+        backfill_rollups()
+        self.assertEqual(rollup_snapshot(), incremental)
+
+    def test_incremental_counts_match_partial_backfill(self):
+        self.fill()
+        incremental = rollup_snapshot()
+
+        backfill_rollups(since=self.now - timedelta(days=1))
+        self.assertEqual(rollup_snapshot(), incremental)
+
+    def test_increment_after_backfill_recreated_rows(self):
+        self.fill()
+        backfill_rollups()
+        self.take('d', self.exams[0], 0, 25)
+        incremental = rollup_snapshot()
+
+        backfill_rollups()
+        self.assertEqual(rollup_snapshot(), incremental)
+
+
+class ArchiveTests(AttemptsTestCase):
+    def archive_everything(self):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        call_command('archive_old_attempts', before=f'{tomorrow:%Y-%m-%d}', stdout=StringIO())
+
+    def test_backfill_after_archive_keeps_history(self):
+        self.fill()
+        incremental = rollup_snapshot()
+
+        self.archive_everything()
+        self.assertFalse(StudentResult.objects.exists())
+        self.assertEqual(ArchivedResult.objects.count(), 5)
+        # Осталась только сессия без результата
+        self.assertEqual(ExamSession.objects.count(), 1)
+
+        backfill_rollups()
+        self.assertEqual(rollup_snapshot(), incremental)
+
+    def test_archived_result_blocks_retake(self):
+        self.take('a', self.exams[0], 0, 50)
+        self.archive_everything()
+        student = User.objects.get(username='a')
+        self.assertTrue(already_taken(student, self.exams[0]))
+        self.assertFalse(already_taken(student, self.exams[1]))
+
+        # Даже с активной сессией повторная сдача не создает результат
+        ExamSession.objects.create(student=student, exam=self.exams[0])
+        self.client.force_login(student)
+        response = self.client.get(f'/exam/{self.exams[0].id}/')
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        response = self.client.post(f'/exam/{self.exams[0].id}/submit/', {})
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        self.assertFalse(StudentResult.objects.exists())
+
+    def test_archive_in_batches(self):
+        for username in 'abcde':
+            self.take(username, self.exams[0], 0, 40)
+        ids = set(StudentResult.objects.values_list('id', flat=True))
+
+        self.assertEqual(archive_results(StudentResult.objects.all(), self.root, batch_size=2), 5)
+        self.assertFalse(StudentResult.objects.exists())
+
+        archived = ArchivedResult.objects.all()
+        self.assertEqual({a.result_id for a in archived}, ids)
+        self.assertTrue(all(a.session_started_at for a in archived))
+
+        # Три пачки — три gzip member в одном файле партиции, читаются как один поток
+        (path,) = {a.archive_path for a in archived}
+        with gzip.open(Path(self.root) / path, 'rt', encoding='utf-8') as handle:
+            self.assertEqual(sorted(json_id(line) for line in handle), sorted(ids))
+        self.assertEqual(load_archived_detail(archived[0])['id'], archived[0].result_id)
+
+    def test_failed_write_deletes_nothing(self):
+        self.take('a', self.exams[0], 0, 50)
+        with mock.patch('core.archive.write_partitions', side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                archive_results(StudentResult.objects.all(), self.root, batch_size=2)
+        self.assertEqual(StudentResult.objects.count(), 1)
+        self.assertFalse(ArchivedResult.objects.exists())
+
+
+def json_id(line):
+    return json.loads(line)['id']
+
+
+class ReportTests(AttemptsTestCase):
+    def test_cohort_includes_archived_results(self):
+        self.take('a', self.exams[0], 0, 50)
+        self.take('b', self.exams[0], 0, 100)
+        StudentResult.objects.filter(student__username='a').update(answers_detail=[{'question_id': 1, 'is_correct': True}])
+        archive_results(StudentResult.objects.filter(student__username='a'), self.root, batch_size=10)
+        self.take('c', self.exams[0], 1, 25)
+
+        cohort = collect_cohort(self.exams[0])
+        self.assertEqual([row['username'] for row in cohort], ['a', 'b', 'c'])
+        self.assertEqual(cohort[0]['answers'], [{'question_id': 1, 'is_correct': True}])
+        self.assertEqual([row['percentile'] for row in cohort], [33, 67, 0])
+        self.assertTrue(all(row['cohort_size'] == 3 for row in cohort))
+
+    def test_report_filenames_are_unique(self):
+        # get_valid_filename превращает оба логина в 'a_b'
+        self.take('a b', self.exams[0], 0, 50)
+        self.take('a_b', self.exams[0], 0, 60)
+        filenames = [row['filename'] for row in collect_cohort(self.exams[0])]
+        self.assertEqual(len(set(filenames)), 2)
+
+    def test_mark_stale(self):
+        now = timezone.now()
+        old = now - ReportJob.STALE_AFTER - timedelta(minutes=1)
+        stale_running = ReportJob.objects.create(exam=self.exams[0], status='running', heartbeat_at=old)
+        fresh_running = ReportJob.objects.create(exam=self.exams[0], status='running', heartbeat_at=now)
+        never_started = ReportJob.objects.create(exam=self.exams[0])
+        ReportJob.objects.filter(pk=never_started.pk).update(created_at=old)
+        done = ReportJob.objects.create(exam=self.exams[0], status='done', heartbeat_at=old)
+
+        self.assertEqual(ReportJob.mark_stale(now), 2)
+        statuses = dict(ReportJob.objects.values_list('pk', 'status'))
+        self.assertEqual(statuses[stale_running.pk], 'failed')
+        self.assertEqual(statuses[never_started.pk], 'failed')
+        self.assertEqual(statuses[fresh_running.pk], 'running')
+        self.assertEqual(statuses[done.pk], 'done')
+
+    def test_start_report_job_reaps_child(self):
+        with mock.patch('core.reports.subprocess.Popen') as popen:
+            popen.return_value.pid = 4242
+            job = start_report_job(self.exams[0])
+
+        reaper = next((t for t in threading.enumerate() if t.name == f'report-job-{job.pk}'), None)
+        if reaper:
+            reaper.join(timeout=5)
+        popen.return_value.wait.assert_called_once_with()
+        job.refresh_from_db()
+        self.assertEqual(job.pid, 4242)
+
+
+class ExamSectionTests(TestCase):
+    def setUp(self):
+        # id в SQLite переиспользуются после отката, а ключи кэша строятся по id и версии
+        cache.clear()
+        self.exam = ReadingExam.objects.create(title='Секции', time_limit_minutes=30)
+        self.sections = [
+            ExamSection.objects.create(exam=self.exam, order=order, passage_text=f'Текст {order}')
+            for order in (1, 2)
+        ]
+        self.questions = []
+        for idx, section in enumerate([self.sections[0], self.sections[1], None]):
+            question = Question.objects.create(exam=self.exam, section=section, text=f'Вопрос {idx}', order=idx + 1)
+            question.right = Choice.objects.create(question=question, text='Да', is_correct=True)
+            question.wrong = Choice.objects.create(question=question, text='Нет', is_correct=False)
+            self.questions.append(question)
+        self.student = User.objects.create_user('student', password='pass')
+        self.client.force_login(self.student)
+
+    def start_session(self):
+        return ExamSession.objects.create(student=self.student, exam=self.exam)
+
+    def test_unsectioned_questions_fall_back_to_first_section(self):
+        self.exam.refresh_from_db()
+        sections = get_exam_content(self.exam)['sections']
+        self.assertEqual([s['order'] for s in sections], [1, 2])
+        self.assertEqual([q.id for q in sections[0]['questions']], [self.questions[0].id, self.questions[2].id])
+        self.assertEqual((sections[1]['first_number'], sections[1]['last_number']), (3, 3))
+
+    def test_grades_answers_across_sections(self):
+        self.start_session()
+        q1, q2, q3 = self.questions
+        response = self.client.post(f'/exam/{self.exam.id}/submit/', {
+            f'question_{q1.id}': q1.right.id,
+            f'question_{q2.id}': q2.right.id,
+            # Вариант чужого вопроса не засчитывается
+            f'question_{q3.id}': q1.right.id,
+        })
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+
+        result = StudentResult.objects.get(student=self.student, exam=self.exam)
+        self.assertEqual((result.score, result.total_questions), (2, 3))
+        detail = {a['question_id']: a for a in result.answers_detail}
+        self.assertEqual(detail[q2.id]['section'], 2)
+        self.assertEqual(detail[q3.id]['section'], 1)
+        self.assertIsNone(detail[q3.id]['user_answer'])
+        self.assertFalse(ExamSession.objects.get(student=self.student, exam=self.exam).is_active)
+
+    def test_section_requires_active_session(self):
+        url = f'/exam/{self.exam.id}/section/2/'
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        session = self.start_session()
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Текст 2')
+        self.assertIn('private', response['Cache-Control'])
+
+        session.is_active = False
+        session.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_expired_session_gets_no_sections(self):
+        session = self.start_session()
+        ExamSession.objects.filter(pk=session.pk).update(started_at=timezone.now() - timedelta(minutes=31))
+        self.assertEqual(self.client.get(f'/exam/{self.exam.id}/section/1/').status_code, 404)
+        self.assertFalse(ExamSession.objects.get(pk=session.pk).is_active)
+
+    def test_section_cache_ends_with_attempt(self):
+        session = self.start_session()
+        ExamSession.objects.filter(pk=session.pk).update(started_at=timezone.now() - timedelta(minutes=20))
+        response = self.client.get(f'/exam/{self.exam.id}/section/1/')
+        max_age = int(response['Cache-Control'].split('max-age=')[1].split(',')[0])
+        self.assertTrue(500 < max_age <= 600)
+
+    def test_missing_section_is_404(self):
+        self.start_session()
+        self.assertEqual(self.client.get(f'/exam/{self.exam.id}/section/3/').status_code, 404)
+        self.assertEqual(self.client.get(f'/exam/{self.exam.id + 100}/section/1/').status_code, 404)
+
+    def test_section_requires_login(self):
+        self.client.logout()
+        response = self.client.get(f'/exam/{self.exam.id}/section/1/')
+        self.assertEqual(response.status_code, 302)
+
+    def test_saving_stale_exam_keeps_content_version(self):
+        stale = ReadingExam.objects.get(pk=self.exam.pk)
+        self.questions[0].text = 'Новый текст'
+        self.questions[0].save()
+        bumped = ReadingExam.objects.get(pk=self.exam.pk).content_version
+        self.assertGreater(bumped, stale.content_version)
+
+        stale.title = 'Новое название'
+        stale.save()
+        exam = ReadingExam.objects.get(pk=self.exam.pk)
+        self.assertEqual(exam.title, 'Новое название')
+        # Сохранение само по себе — тоже правка, сигнал увеличивает версию дальше
+        self.assertGreater(exam.content_version, bumped)
+
+
+class ExamSectionAdminTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', password='pass')
+        self.client.force_login(self.admin)
+        self.exam, self.other = make_exam('Свой'), make_exam('Чужой')
+        for exam in (self.exam, self.other):
+            for order in (1, 2, 3):
+                ExamSection.objects.create(exam=exam, order=order, title=f'{exam.title} {order}', passage_text='Текст')
+
+    def change_page_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/admin/core/readingexam/{self.exam.id}/change/')
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_section_choices_do_not_query_per_row(self):
+        _, few = self.change_page_queries()
+        for i in range(10):
+            Question.objects.create(exam=self.exam, text=f'Еще {i}')
+        _, many = self.change_page_queries()
+        self.assertEqual(few, many)
+
+    def test_only_own_sections_offered(self):
+        response, _ = self.change_page_queries()
+        self.assertContains(response, 'Свой - Passage 2')
+        self.assertNotContains(response, 'Чужой - Passage')
+
+    def test_question_rejects_section_of_other_exam(self):
+        question = self.exam.questions.first()
+        question.section = self.other.sections.first()
+        with self.assertRaises(ValidationError) as raised:
+            question.full_clean()
+        self.assertIn('section', raised.exception.message_dict)
+
+        question.section = self.exam.sections.first()
+        question.full_clean()
+
+
+class ExamWindowTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.exam = make_exam(opens_at=self.now - timedelta(hours=1), closes_at=self.now - timedelta(minutes=1))
+        self.student = User.objects.create_user('student', password='pass')
+        self.client.force_login(self.student)
+
+    def test_closed_window_blocks_new_sitting(self):
+        response = self.client.get(f'/exam/{self.exam.id}/')
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        self.assertFalse(ExamSession.objects.exists())
+
+    def test_sitting_started_before_close_can_resume_and_submit(self):
+        # Начал за 5 минут до closes_at, лимит 30 минут еще не вышел
+        session = ExamSession.objects.create(student=self.student, exam=self.exam)
+        ExamSession.objects.filter(pk=session.pk).update(started_at=self.now - timedelta(minutes=6))
+
+        with mock.patch('core.views.render', return_value=HttpResponse('ok')) as render:
+            response = self.client.get(f'/exam/{self.exam.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(render.call_args.args[1], 'take_exam.html')
+
+        self.assertEqual(self.client.get(f'/exam/{self.exam.id}/section/1/').status_code, 200)
+
+        response = self.client.post(f'/exam/{self.exam.id}/submit/', {})
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        self.assertTrue(StudentResult.objects.filter(student=self.student, exam=self.exam).exists())
+        self.assertFalse(ExamSession.objects.get(pk=session.pk).is_active)
+
+
+class GradebookTests(TestCase):
+    def setUp(self):
+        self.exams = [make_exam(f'Экзамен {i}') for i in range(3)]
+        # Колонки идут по created_at, поэтому делаем его заведомо разным
+        for i, exam in enumerate(self.exams):
+            ReadingExam.objects.filter(pk=exam.pk).update(created_at=timezone.now() - timedelta(days=3 - i))
+        e1, e2, e3 = self.exams
+        self.add('alice', e1, 90)
+        self.add('alice', e2, 50, archived=True)
+        self.add('bob', e1, 40)
+        self.add('bob', e3, 70)
+        self.add('carol', e2, 100)
+
+    def add(self, username, exam, percentage, archived=False):
+        student = User.objects.get_or_create(username=username)[0]
+        fields = dict(student=student, exam=exam, score=1, total_questions=2, percentage=percentage,
+                      completed_at=timezone.now())
+        if archived:
+            ArchivedResult.objects.create(result_id=ArchivedResult.objects.count() + 1000, archive_path='', **fields)
+        else:
+            StudentResult.objects.create(**fields)
+
+    def pivot(self, rows):
+        return {
+            username: ([None if math.isnan(v) else v for v in values], avg)
+            for username, values, avg in rows
+        }
+
+    def test_pivot_with_missing_and_archived_results(self):
+        exams, rows = build_gradebook()
+        self.assertEqual([exam_id for exam_id, _ in exams], [e.id for e in self.exams])
+        self.assertEqual(self.pivot(rows), {
+            # 50 у alice — из архива, 90 — из рабочей таблицы
+            'alice': ([90, 50, None], 70),
+            'bob': ([40, None, 70], 55),
+            'carol': ([None, 100, None], 100),
+        })
+
+    def test_exam_filter_and_search(self):
+        exams, rows = build_gradebook(exam_ids=[self.exams[1].id])
+        self.assertEqual(len(exams), 1)
+        self.assertEqual(self.pivot(rows), {'alice': ([50], 50), 'carol': ([100], 100)})
+
+        _, rows = build_gradebook(search='AL')
+        self.assertEqual(list(self.pivot(rows)), ['alice'])
+
+    def test_sort_keeps_empty_cells_last(self):
+        exams, rows = build_gradebook()
+        first = str(self.exams[0].id)
+        cases = [
+            (first, False, ['bob', 'alice', 'carol']),
+            (first, True, ['alice', 'bob', 'carol']),
+            (str(self.exams[2].id), True, ['bob', 'alice', 'carol']),
+            ('avg', False, ['bob', 'alice', 'carol']),
+            ('avg', True, ['carol', 'alice', 'bob']),
+            ('name', True, ['carol', 'bob', 'alice']),
+            ('unknown', True, ['alice', 'bob', 'carol']),
+        ]
+        for sort, descending, expected in cases:
+            with self.subTest(sort=sort, descending=descending):
+                sort_gradebook(rows, exams, sort, descending)
+                self.assertEqual([row[0] for row in rows], expected)
+
+    def test_streamed_rows_between_head_and_tail(self):
+        self.client.force_login(User.objects.create_superuser('staff', password='pass'))
+        response = self.client.get('/admin/gradebook/', {'sort': 'avg', 'dir': 'desc'})
+        self.assertTrue(response.streaming)
+        page = b''.join(response.streaming_content).decode()
+
+        positions = [page.index(marker) for marker in ('<tbody>', '>carol<', '>alice<', '>bob<', '</tbody>')]
+        self.assertEqual(positions, sorted(positions))
+        self.assertIn('<td class="text-warning">50</td>', page)
+        self.assertNotIn(GRADEBOOK_ROWS_MARKER, page)
@@ -2,10 +2,25 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
 from django.utils import timezone
-from .models import ReadingExam, Question, Choice, StudentResult, ExamSession
+from django.http import JsonResponse, FileResponse, Http404, StreamingHttpResponse, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.template.loader import render_to_string
+from django.conf import settings
+from django.views.decorators.http import require_POST
+from django.db import transaction
+from django.db.models import Sum
+from datetime import timedelta
+from .models import ReadingExam, Question, StudentResult, ExamSession, ExamActivityHourly, ExamActivityDaily, ArchivedResult, ReportJob
+from .exam_cache import get_exam_content, get_section_html
+from .proctoring import parse_batch, record_batch
+from .rollups import record_submission, record_session_start
+from .archive import already_taken
+from .gradebook import build_gradebook, sort_gradebook, render_rows
 import json
+from pathlib import Path
 
 
 def register(request):
@@ -31,9 +46,14 @@ def register(request):
 @login_required
 def dashboard(request):
     exams = ReadingExam.objects.prefetch_related('questions').all().order_by('-created_at')
-    taken_exams_ids = StudentResult.objects.filter(student=request.user).values_list('exam_id', flat=True)
-    results_map = {r.exam_id: r for r in StudentResult.objects.filter(student=request.user)}
-
+    # С --closed-exams в архив попадают и свежие попытки, поэтому сортируем общий список
+    user_results = list(StudentResult.objects.filter(student=request.user).select_related('exam'))
+    user_results += list(ArchivedResult.objects.filter(student=request.user).select_related('exam'))
+    user_results.sort(key=lambda r: r.completed_at, reverse=True)
+    results_map = {r.exam_id: r for r in user_results}
+    taken_exams_ids = set(results_map)
+
+    now = timezone.now()
     exam_data = []
     for exam in exams:
         is_taken = exam.id in taken_exams_ids
@@ -47,11 +67,11 @@ def dashboard(request):
             'is_taken': is_taken,
             'result': result,
             'types_summary': types_summary,
-            'question_count': exam.questions.count()
+            'question_count': exam.questions.count(),
+            'window_status': exam.window_status(now)
         })
 
-    user_results = StudentResult.objects.filter(student=request.user)
-    total_taken = user_results.count()
+    total_taken = len(user_results)
     avg_score = 0
     if total_taken > 0:
         avg_score = sum([r.percentage for r in user_results]) / total_taken
@@ -70,16 +90,32 @@ def take_exam(request, exam_id):
     exam = get_object_or_404(ReadingExam, id=exam_id)
 
     # Проверка: если уже сдавал
-    if StudentResult.objects.filter(student=request.user, exam=exam).exists():
+    if already_taken(request.user, exam):
         messages.warning(request, "Вы уже сдавали этот экзамен. Пересдача запрещена.")
         return redirect('dashboard')
 
-    # Создаем или получаем сессию
-    session, created = ExamSession.objects.get_or_create(
-        student=request.user,
-        exam=exam,
-        defaults={'is_active': True}
-    )
+    session = ExamSession.objects.filter(student=request.user, exam=exam).first()
+    if session is None:
+        # Окно сдачи ограничивает только начало попытки: начатая до closes_at
+        # досдается в пределах time_limit_minutes (так же в exam_section и submit_exam)
+        window_status = exam.window_status()
+        if window_status == 'upcoming':
+            opens_at = timezone.localtime(exam.opens_at)
+            messages.warning(request, f"Экзамен откроется {opens_at:%d.%m.%Y %H:%M}.")
+            return redirect('dashboard')
+        if window_status == 'closed':
+            messages.error(request, "Окно сдачи этого экзамена закрыто.")
+            return redirect('dashboard')
+
+        # Счетчик сводки — в той же транзакции, чтобы backfill_rollups не посчитал сессию дважды
+        with transaction.atomic():
+            session, created = ExamSession.objects.get_or_create(
+                student=request.user,
+                exam=exam,
+                defaults={'is_active': True}
+            )
+            if created:
+                record_session_start(session)
 
     # Проверяем, не истекло ли время
     if session.is_expired():
@@ -88,7 +124,38 @@ def take_exam(request, exam_id):
         session.save()
         return redirect('dashboard')
 
-    return render(request, 'take_exam.html', {'exam': exam, 'session': session})
+    # Сразу рендерим только первую секцию, остальные подгружаются через exam_section
+    content = get_exam_content(exam)
+    return render(request, 'take_exam.html', {
+        'exam': exam,
+        'session': session,
+        'sections': content['sections'],
+        'first_section': content['sections'][0],
+        'question_count': content['question_count'],
+    })
+
+
+@login_required
+def exam_section(request, exam_id, order):
+    """HTML одной секции для идущей попытки. Окно сдачи проверяет take_exam при ее создании"""
+    exam = get_object_or_404(ReadingExam, id=exam_id)
+    session = ExamSession.objects.filter(student=request.user, exam=exam, is_active=True).first()
+    if session is None:
+        raise Http404("Активная сессия не найдена")
+    if session.is_expired():
+        session.is_active = False
+        session.save()
+        raise Http404("Время на прохождение теста истекло")
+
+    html = get_section_html(exam, order)
+    if html is None:
+        raise Http404("Секция не найдена")
+
+    # Браузер может держать секцию в кэше, но не дольше, чем идет попытка
+    remaining = exam.time_limit_minutes * 60 - (timezone.now() - session.started_at).total_seconds()
+    response = HttpResponse(html)
+    patch_cache_control(response, private=True, max_age=max(int(remaining), 0))
+    return response
 
 
 @login_required
@@ -111,24 +178,27 @@ def submit_exam(request, exam_id):
         return redirect('dashboard')
 
     # Проверка на повторную сдачу
-    if StudentResult.objects.filter(student=request.user, exam=exam).exists():
+    if already_taken(request.user, exam):
         messages.warning(request, "Вы уже сдавали этот экзамен.")
         return redirect('dashboard')
 
-    questions = exam.questions.all()
+    # Вопросы всех секций по порядку, варианты ответов уже подгружены в кэше
+    content = get_exam_content(exam)
+    questions = [(section['order'], q) for section in content['sections'] for q in section['questions']]
     score = 0
-    total_questions = questions.count()
+    total_questions = content['question_count']
     answers_detail = []
 
-    for question in questions:
+    for section_order, question in questions:
         is_correct = False
         user_answer = None
+        choices = {str(c.id): c for c in question.choices.all()}
 
         if question.question_type == 'single_choice':
             # Один правильный ответ
             selected_choice_id = request.POST.get(f'question_{question.id}')
             if selected_choice_id:
-                choice = Choice.objects.filter(id=selected_choice_id).first()
+                choice = choices.get(selected_choice_id)
                 if choice:
                     user_answer = choice.text
                     if choice.is_correct:
@@ -138,10 +208,10 @@ def submit_exam(request, exam_id):
         elif question.question_type == 'multiple_choice':
             # Несколько правильных ответов
             selected_choices = request.POST.getlist(f'question_{question.id}')
-            correct_choices = set(question.choices.filter(is_correct=True).values_list('id', flat=True))
-            selected_set = set([int(c) for c in selected_choices if c.isdigit()])
+            correct_choices = set([c.id for c in choices.values() if c.is_correct])
+            selected_set = set([int(c) for c in selected_choices if c in choices])
 
-            user_answer = ", ".join([Choice.objects.get(id=int(c)).text for c in selected_choices if c.isdigit()])
+            user_answer = ", ".join([choices[c].text for c in selected_choices if c in choices])
 
             if selected_set == correct_choices:
                 is_correct = True
@@ -151,7 +221,7 @@ def submit_exam(request, exam_id):
             # True/False/Not Given
             selected_choice_id = request.POST.get(f'question_{question.id}')
             if selected_choice_id:
-                choice = Choice.objects.filter(id=selected_choice_id).first()
+                choice = choices.get(selected_choice_id)
                 if choice:
                     user_answer = choice.text
                     if choice.is_correct:
@@ -190,6 +260,7 @@ def submit_exam(request, exam_id):
 
         # Сохраняем детали ответа
         answers_detail.append({
+            'section': section_order,
             'question_id': question.id,
             'question_text': question.text,
             'question_type': question.question_type,
@@ -199,19 +270,160 @@ def submit_exam(request, exam_id):
 
     percentage = (score / total_questions) * 100 if total_questions > 0 else 0
 
-    # Сохраняем результат
-    StudentResult.objects.create(
-        student=request.user,
-        exam=exam,
-        score=score,
-        total_questions=total_questions,
-        percentage=percentage,
-        answers_detail=answers_detail
-    )
+    # Сохраняем результат вместе со сводкой и закрываем сессию
+    with transaction.atomic():
+        result = StudentResult.objects.create(
+            student=request.user,
+            exam=exam,
+            score=score,
+            total_questions=total_questions,
+            percentage=percentage,
+            answers_detail=answers_detail
+        )
+        record_submission(result)
 
-    # Закрываем сессию
-    session.is_active = False
-    session.save()
+        session.is_active = False
+        session.save()
 
     messages.success(request, f'Тест завершен! Ваш результат: {score}/{total_questions} ({percentage:.1f}%)')
-    return redirect('dashboard')
\ No newline at end of file
+    return redirect('dashboard')
+
+
+@login_required
+@require_POST
+def record_proctoring_events(request, exam_id):
+    """Принимает пакет событий прокторинга из Take_Exam.html"""
+    session = ExamSession.objects.select_related('exam').filter(
+        student=request.user, exam_id=exam_id, is_active=True
+    ).first()
+    if session is None:
+        return JsonResponse({'error': "Активная сессия не найдена"}, status=404)
+
+    try:
+        payload = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': "Некорректный JSON"}, status=400)
+
+    try:
+        question_ids = get_exam_content(session.exam)['question_ids']
+        events = parse_batch(payload, session, question_ids)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    accepted = record_batch(session, events)
+    return JsonResponse({'accepted': accepted})
+
+
+@staff_member_required
+def activity_dashboard(request):
+    """Графики активности. Читает только таблицы сводок, не StudentResult"""
+    try:
+        days = min(max(int(request.GET.get('days', 30)), 1), 365)
+    except ValueError:
+        days = 30
+    exam_id = request.GET.get('exam')
+
+    now = timezone.now()
+    hourly = ExamActivityHourly.objects.filter(hour__gte=now - timedelta(hours=72))
+    daily = ExamActivityDaily.objects.filter(day__gte=timezone.localdate(now) - timedelta(days=days - 1))
+    if exam_id and exam_id.isdigit():
+        hourly = hourly.filter(exam_id=exam_id)
+        daily = daily.filter(exam_id=exam_id)
+
+    hourly_rows = hourly.values('hour').annotate(
+        submissions=Sum('submissions'), sessions=Sum('sessions_started')
+    ).order_by('hour')
+    hourly_chart = {
+        'labels': [timezone.localtime(r['hour']).strftime('%d.%m %H:00') for r in hourly_rows],
+        'submissions': [r['submissions'] for r in hourly_rows],
+        'sessions': [r['sessions'] for r in hourly_rows],
+    }
+
+    day_labels = [(timezone.localdate(now) - timedelta(days=d)).isoformat() for d in range(days - 1, -1, -1)]
+    per_exam = {}
+    totals = {}
+    for r in daily.values('day', 'exam_id', 'exam__title', 'submissions', 'percentage_sum'):
+        if not r['submissions']:
+            continue
+        day = r['day'].isoformat()
+        per_exam.setdefault((r['exam_id'], r['exam__title']), {})[day] = round(r['percentage_sum'] / r['submissions'], 1)
+        day_total = totals.setdefault(day, [0, 0.0])
+        day_total[0] += r['submissions']
+        day_total[1] += r['percentage_sum']
+    total_submissions = sum(t[0] for t in totals.values())
+    avg_percentage = sum(t[1] for t in totals.values()) / total_submissions if total_submissions else 0
+
+    daily_chart = {
+        'labels': day_labels,
+        'submissions': [totals.get(day, [0])[0] for day in day_labels],
+        'exams': [
+            {'title': title, 'avg': [values.get(day) for day in day_labels]}
+            for (_, title), values in sorted(per_exam.items(), key=lambda item: item[0][1])
+        ],
+    }
+
+    context = {
+        'title': 'Активность',
+        'days': days,
+        'exam_id': exam_id or '',
+        'exams': ReadingExam.objects.order_by('title').values('id', 'title'),
+        'hourly_chart': hourly_chart,
+        'daily_chart': daily_chart,
+        'total_submissions': total_submissions,
+        'avg_percentage': round(avg_percentage, 1),
+    }
+    return render(request, 'Activity.html', context)
+
+
+@staff_member_required
+def download_report(request, job_id):
+    job = get_object_or_404(ReportJob, id=job_id, status='done')
+    path = Path(settings.REPORTS_ROOT) / job.archive_path
+    if not path.exists():
+        raise Http404("Файл отчетов не найден")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
+
+
+GRADEBOOK_ROWS_MARKER = '<!-- gradebook rows -->'
+
+
+@staff_member_required
+def gradebook(request):
+    """Журнал: процент по каждому студенту и экзамену. Строки отдаются потоком"""
+    exam_ids = [int(x) for x in request.GET.getlist('exam') if x.isdigit()]
+    search = request.GET.get('q', '').strip()
+    sort = request.GET.get('sort', 'name')
+    descending = request.GET.get('dir') == 'desc'
+
+    exams, rows = build_gradebook(exam_ids, search)
+    sort_gradebook(rows, exams, sort, descending)
+
+    def sort_link(key):
+        params = request.GET.copy()
+        params['sort'] = key
+        # Повторный клик по активной колонке меняет направление
+        params['dir'] = 'desc' if sort == key and not descending else 'asc'
+        return {
+            'url': '?' + params.urlencode(),
+            'arrow': ('▼' if descending else '▲') if sort == key else '',
+        }
+
+    page = render_to_string('Gradebook.html', {
+        'title': 'Журнал',
+        'all_exams': ReadingExam.objects.order_by('created_at').values('id', 'title'),
+        'selected_exams': exam_ids,
+        'search': search,
+        'student_count': len(rows),
+        'name_sort': sort_link('name'),
+        'avg_sort': sort_link('avg'),
+        'columns': [dict(sort_link(str(exam_id)), title=title) for exam_id, title in exams],
+        'rows_marker': GRADEBOOK_ROWS_MARKER,
+    }, request=request)
+    head, tail = page.split(GRADEBOOK_ROWS_MARKER)
+
+    def stream():
+        yield head
+        yield from render_rows(rows)
+        yield tail
+
+    return StreamingHttpResponse(stream(), content_type='text/html; charset=utf-8')
\ No newline at end of file
@@ -0,0 +1,38 @@
+# Подхватывается gunicorn автоматически из рабочей директории (см. Procfile)
+import threading
+import time
+
+# Каждый воркер сам прогревает экзамены, окно которых откроется в ближайшие PREWARM_MINUTES.
+# Без REDIS_URL кэш у каждого воркера свой, и команда prewarm_exams до него не дотягивается
+PREWARM_MINUTES = 15
+PREWARM_INTERVAL = 60
+
+
+def _prewarm_loop(worker):
+    from django.db import connection
+    from core.exam_cache import exams_to_prewarm, warm_exam
+
+    while True:
+        try:
+            for exam in exams_to_prewarm(PREWARM_MINUTES):
+                # Уже прогретая версия берется из кэша, повторной сборки нет
+                warm_exam(exam, rebuild=False)
+        except Exception:
+            worker.log.exception("Не удалось прогреть экзамены")
+        finally:
+            # Соединения Django привязаны к потоку — свое закрываем, чтобы не висело между тиками
+            connection.close()
+        time.sleep(PREWARM_INTERVAL)
+
+
+def post_worker_init(worker):
+    """Открывает соединение с БД и запускает фоновый прогрев экзаменов в этом воркере.
+
+    Соединение открывается только при старте воркера: при CONN_MAX_AGE=600 Django закроет его
+    на первом запросе после 10 минут простоя, и новое откроется уже в этом запросе. Держать
+    соединения теплыми к началу экзамена может только пул на стороне БД (например, pgbouncer).
+    """
+    from django.db import connection
+
+    connection.ensure_connection()
+    threading.Thread(target=_prewarm_loop, args=(worker,), name='exam-prewarm', daemon=True).start()